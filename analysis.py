@@ -0,0 +1,166 @@
+"""Ride compliance for `analyze`: a recorded power log against the planned target"""
+import csv
+import os
+from array import array
+from operator import gt, lt
+
+from metrics import RollingNP
+from parallel import parallel_map
+
+# Bytes of ride file read per chunk
+CHUNK_BYTES = 1 << 20
+
+# Seconds within +/- this fraction of target count as on target
+TOLERANCE = 0.10
+
+POWER_COLUMNS = ("power", "watts", "power_w", "power (w)", "pwr")
+
+
+class Target:
+    """The planned target of a workout, prepared once and shared by every ride"""
+    __slots__ = ("target", "upper", "lower", "bounds", "ftp", "tolerance")
+
+    def __init__(self, workout, tolerance=TOLERANCE):
+        if workout.ftp is None or workout.ftp <= 0:
+            raise ValueError("FTP must be set to analyze a ride")
+        self.ftp = workout.ftp
+        self.tolerance = tolerance
+        self.target = workout.power_stream()
+        self.upper = array("d", (t * (1 + tolerance) for t in self.target))
+        self.lower = array("d", (t * (1 - tolerance) for t in self.target))
+        # Start second of each top-level block, plus the end of the workout
+        bounds = [0]
+        for b in workout.blocks:
+            bounds.append(bounds[-1] + b.seconds)
+        self.bounds = bounds
+
+
+def _power_column(header):
+    names = [h.strip().lower() for h in header]
+    for name in POWER_COLUMNS:
+        if name in names:
+            return names.index(name)
+    raise ValueError(f"No power column in header: {', '.join(header)}")
+
+
+def iter_power_chunks(path, chunk_bytes=CHUNK_BYTES):
+    """Yield the watts column of a ride CSV as array('d') chunks; blank samples are 0 W"""
+    with open(path, newline="", encoding="utf-8") as f:
+        column = None
+        while True:
+            lines = f.readlines(chunk_bytes)
+            if not lines:
+                return
+            rows = csv.reader(lines)
+            if column is None:
+                first = next((row for row in rows if row), None)
+                if first is None:
+                    continue
+                try:
+                    [float(v) for v in first if v.strip()]
+                except ValueError:
+                    column = _power_column(first)  # header row
+                    first = None
+                else:
+                    column = 0 if len(first) == 1 else 1
+                if first is not None:
+                    rows = _chain_first(first, rows)
+            chunk = array("d")
+            for row in rows:
+                if not row:
+                    continue
+                try:
+                    value = row[column].strip()
+                    chunk.append(float(value) if value else 0.0)
+                except (IndexError, ValueError):
+                    raise ValueError(f"{path}: bad power value in row {row!r}")
+            yield chunk
+
+
+def _chain_first(first, rows):
+    yield first
+    yield from rows
+
+
+def analyze_ride(path, planned, chunk_bytes=CHUNK_BYTES):
+    """
+    Compliance of one ride against a Target. Returns a dict with the
+    ride's seconds, avg power, NP, IF and TSS, the seconds within / above /
+    below the target band over the planned part, and a per-block list of
+    (planned s, ridden s, target avg W, actual avg W, within s, above s, below s).
+    """
+    target, upper, lower, bounds = planned.target, planned.upper, planned.lower, planned.bounds
+    n_blocks = len(bounds) - 1
+    blocks = [[bounds[b + 1] - bounds[b], 0, 0.0, 0.0, 0, 0, 0] for b in range(n_blocks)]
+    np_ = RollingNP()
+    pos = 0
+    b = 0
+    for chunk in iter_power_chunks(path, chunk_bytes):
+        np_.update(chunk)
+        end = pos + len(chunk)
+        while b < n_blocks and bounds[b] < end:
+            lo, hi = max(bounds[b], pos), min(bounds[b + 1], end)
+            if hi > lo:
+                actual = chunk[lo - pos:hi - pos]
+                above = sum(map(gt, actual, upper[lo:hi]))
+                below = sum(map(lt, actual, lower[lo:hi]))
+                row = blocks[b]
+                row[1] += hi - lo
+                row[2] += sum(target[lo:hi])
+                row[3] += sum(actual)
+                row[4] += (hi - lo) - above - below
+                row[5] += above
+                row[6] += below
+            if bounds[b + 1] > end:
+                break  # block continues in the next chunk
+            b += 1
+        pos = end
+
+    ftp = planned.ftp
+    seconds = np_.count
+    np_value = np_.value()
+    if_ = np_value / ftp
+    ridden = sum(row[1] for row in blocks)
+    within = sum(row[4] for row in blocks)
+    for row in blocks:
+        if row[1]:
+            row[2] /= row[1]
+            row[3] /= row[1]
+    return {
+        "path": path,
+        "seconds": seconds,
+        "planned_seconds": bounds[-1],
+        "ridden": ridden,  # planned seconds covered by the ride
+        "avg_power": np_.total / seconds if seconds else 0.0,
+        "np": np_value,
+        "if": if_,
+        "tss": seconds * np_value * if_ / (ftp * 36),
+        "within": within,
+        "above": sum(row[5] for row in blocks),
+        "below": sum(row[6] for row in blocks),
+        "compliance": within / bounds[-1] if bounds[-1] else 0.0,
+        "blocks": [tuple(row) for row in blocks],
+    }
+
+
+def _analyze_chunk(paths, planned):
+    """Analyze several rides (process pool worker); failures come back as error dicts"""
+    results = []
+    for path in paths:
+        try:
+            results.append(analyze_ride(path, planned))
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            results.append({"path": path, "error": str(e)})
+    return results
+
+
+def ride_files(root):
+    """*.csv ride files directly under root, sorted"""
+    return sorted(os.path.join(root, name) for name in os.listdir(root)
+                  if name.lower().endswith(".csv"))
+
+
+def analyze_many(paths, planned, jobs=None):
+    """Analyze rides against a Target across a process pool, in the order of paths"""
+    # A ride file takes 0.1-1 s to analyze, so even a few are worth a pool
+    return parallel_map(_analyze_chunk, paths, planned, jobs=jobs, min_items=4)
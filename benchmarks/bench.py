@@ -0,0 +1,276 @@
+"""
+Benchmarks for the Workout engine and REPL hot paths.
+
+Builds synthetic workouts of every block type at several sizes, times the
+hot paths and writes seconds-per-call to JSON. With --baseline, results
+are compared against a stored run and the exit status is 1 when any case
+is slower than the baseline by more than --threshold.
+
+    python benchmarks/bench.py -o results.json
+    python benchmarks/bench.py --save-baseline            # store benchmarks/baseline.json
+    python benchmarks/bench.py --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+import plan  # noqa: E402
+from workout import Workout  # noqa: E402
+
+DEFAULT_SIZES = (10, 1_000, 10_000, 100_000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+FTP = 250
+
+# Changes smaller than this (seconds per call) are timer noise, not regressions
+MIN_DELTA = 1e-6
+
+DURATIONS = ("300", "300s", "5min", "12min", "5:30", "0:45", "90s", "1:00")
+
+SCRIPT = [
+    "ftp 250",
+    "add warmup 100 200 10min",
+    "add Z2 20min",
+    "add 300 30s",
+    "add Z1 30s",
+    "copy 2 3",
+    "paste x8",
+    "add interval 320 3min 150 2min 4",
+    "edit 1 -zone Z3",
+    "edit 2 -power 310",
+    "delete 4",
+    "undo",
+    "redo",
+    "ftp 265",
+    "optimize",
+    "add cooldown 180 100 10min",
+    "export bench",
+]
+
+
+def build_workout(n):
+    """Workout of n blocks cycling through every block type"""
+    w = Workout()
+    w.set_ftp(FTP)
+    pair = None
+    for i in range(n):
+        kind = i % 6
+        if kind == 0:
+            w.add_block("steady", zone=f"Z{i // 6 % 6 + 1}", duration=60 + i % 240, power_mode="zone")
+        elif kind == 1:
+            w.add_block("steady", zone="AUTO", duration=30 + i % 90, power=150 + i % 200)
+        elif kind == 2:
+            w.add_block("warmup", power_start=100, power_end=180 + i % 50, duration=300)
+        elif kind == 3:
+            w.add_block("interval", power1=300 + i % 40, dur1=30, power2=150, dur2=30, reps=1 + i % 8)
+        elif kind == 4:
+            if pair is None:
+                pair = tuple(w.blocks[i - 4:i - 2])
+            w.add_block("repeat", blocks=pair, count=2 + i % 6)
+        else:
+            w.add_block("cooldown", power_start=180, power_end=100, duration=300)
+    w._undo.clear()
+    return w
+
+
+def _timeline_case(w, sink):
+    main.workout = w
+    main.view_start = max(0, len(w.blocks) // 2)
+    from rich.console import Console
+    console = Console(file=sink, width=120, force_terminal=True)
+
+    def render():
+        # Rendered into an in-memory console instead of the terminal
+        saved, main.console = main.console, console
+        try:
+            main.display_timeline()
+        finally:
+            main.console = saved
+    return render
+
+
+def _ftp_case(w):
+    # update_auto_powers used to rescale every zone block here; zone blocks
+    # are now stored relative to FTP, so an FTP change is the equivalent.
+    ftps = iter(range(10 ** 9))
+    return lambda: w.set_ftp(200 + next(ftps) % 100)
+
+
+def _export_case(w, tmp_dir):
+    path = os.path.join(tmp_dir, "bench.zwo")
+    return lambda: w.export(path, name="Bench")
+
+
+def _parse_durations():
+    for d in DURATIONS:
+        main.parse_duration_to_seconds(d)
+
+
+def _plan_whatif():
+    # A season for a squad: 50 athletes x 365 days, 5 workouts a week.
+    # Each call moves one early-season day for everyone and reads the loads.
+    p = plan.Plan()
+    start = datetime.date(2026, 1, 5)
+    for a in range(50):
+        p.athlete(f"athlete{a}", 250)
+    for d in range(365):
+        if d % 7 not in (0, 4):
+            p.schedule(start + datetime.timedelta(days=d), "w", 40 + (d * 37) % 90)
+    p.summary()
+    tss = iter(range(10 ** 9))
+
+    def run():
+        extra = next(tss) % 100
+        for a in p.athletes.values():
+            a.remove(3)
+            a.add(3, "what-if", None, extra)
+        p.summary()
+    return run
+
+
+def _repl_session(tmp_dir):
+    def run():
+        main.workout = Workout()
+        main.interactive = False
+        main.export_dir = tmp_dir
+        for cmd in SCRIPT:
+            main.execute(cmd)
+    return run
+
+
+# name -> factory(workout, tmp_dir, sink) returning the callable to time
+SIZED_CASES = {
+    "to_zwo": lambda w, tmp, sink: lambda: w.to_zwo("Bench"),
+    "export": lambda w, tmp, sink: _export_case(w, tmp),
+    "estimate_tss": lambda w, tmp, sink: w.estimate_tss,
+    "total_seconds": lambda w, tmp, sink: w.total_seconds,
+    "update_auto_powers": lambda w, tmp, sink: _ftp_case(w),
+    "display_timeline": lambda w, tmp, sink: _timeline_case(w, sink),
+}
+
+# name -> factory(tmp_dir); independent of workout size
+FIXED_CASES = {
+    "parse_duration_to_seconds": lambda tmp: _parse_durations,
+    "plan_whatif": lambda tmp: _plan_whatif(),
+    "repl_session": _repl_session,
+}
+
+
+def measure(fn, repeat=3, min_time=0.2):
+    """Best seconds per call of fn, timeit-style"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(sizes, only=None, repeat=3):
+    """Run the selected cases; returns {"case/size": seconds per call}"""
+    results = {}
+    selected = lambda name: not only or name in only  # noqa: E731
+    sink = io.StringIO()  # swallows everything the cases print
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sink):
+        try:
+            for size in sizes:
+                w = None
+                for name, factory in SIZED_CASES.items():
+                    if not selected(name):
+                        continue
+                    if w is None:
+                        w = build_workout(size)
+                    results[f"{name}/{size}"] = measure(factory(w, tmp, sink), repeat)
+                    sink.seek(0)
+                    sink.truncate()
+            for name, factory in FIXED_CASES.items():
+                if selected(name):
+                    results[name] = measure(factory(tmp), repeat)
+                    sink.seek(0)
+                    sink.truncate()
+        finally:
+            main.interactive = True
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; returns the names of regressed cases"""
+    regressions = []
+    print(f"{'case':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<34} {'-':>12} {_fmt(seconds):>12} {'new':>8}")
+            continue
+        change = seconds / base - 1 if base else 0.0
+        flag = ""
+        if change > threshold and seconds - base > MIN_DELTA:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<34} {_fmt(base):>12} {_fmt(seconds):>12} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def _fmt(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f} s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} µs"
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated workout sizes in blocks")
+    parser.add_argument("--only", default="", help="comma-separated case names to run")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repeats (best is kept)")
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"store results as the baseline (default {os.path.relpath(DEFAULT_BASELINE)})")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = {s for s in args.only.split(",") if s}
+    unknown = only - set(SIZED_CASES) - set(FIXED_CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    results = run(sizes, only, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "elapsed": time.perf_counter() - start,
+        "results": results,
+    }
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,81 @@
+"""
+Startup budget check.
+
+Imports each CLI module in a fresh interpreter under `python -X importtime`
+and fails (exit 1) when the import takes longer than its budget or pulls
+in a module that should only be loaded on demand.
+
+    python benchmarks/startup.py [--runs 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time budget per module, in microseconds
+BUDGETS = {
+    "workout": 25_000,
+    "main": 60_000,
+}
+
+# Modules that must not be imported at startup (prefix match)
+DEFERRED = ("rich", "readline", "sqlite3", "multiprocessing",
+            "concurrent.futures.process", "xml.etree", "tempfile", "asyncio")
+
+
+def import_profile(module):
+    """{module name: cumulative µs} from one `python -X importtime` run"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:
+            continue  # header line
+    return times
+
+
+def check(module, budget, runs):
+    """Return a list of problems for module (empty when within budget)"""
+    best = None
+    loaded = set()
+    for _ in range(runs):
+        times = import_profile(module)
+        loaded.update(times)
+        best = times[module] if best is None else min(best, times[module])
+
+    problems = []
+    deferred = sorted(name for name in loaded
+                      if any(name == d or name.startswith(d + ".") for d in DEFERRED))
+    if deferred:
+        problems.append(f"imports {', '.join(deferred)} at startup")
+    if best > budget:
+        problems.append(f"took {best / 1000:.1f} ms (budget {budget / 1000:.1f} ms)")
+    status = "FAIL" if problems else "ok"
+    print(f"{module:<10} {best / 1000:7.1f} ms  / {budget / 1000:.1f} ms  {status}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="imports per module (best is kept)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, budget in BUDGETS.items():
+        for problem in check(module, budget, args.runs):
+            print(f"  {module}: {problem}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
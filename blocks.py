@@ -0,0 +1,280 @@
+import sys
+
+from zones import DEFAULT_MODEL
+
+# Target power per zone as a fraction of FTP (default zone model)
+ZONE_TARGETS = DEFAULT_MODEL.targets
+
+
+def to_seconds(d):
+    """Convert a stored duration (int or legacy "300s" string) to seconds"""
+    if isinstance(d, bool):
+        raise ValueError(f"Invalid duration: {d!r}")
+    if isinstance(d, int):
+        return d
+    if isinstance(d, str):
+        d = d.strip().lower()
+        return int(d[:-1] if d.endswith("s") else d)
+    raise ValueError(f"Invalid duration: {d!r}")
+
+
+class Block:
+    """
+    Base class for workout blocks.
+
+    Blocks use __slots__ and integer seconds instead of free-form dicts.
+    Dict-style reads (b["power"], b.get("zone"), b.copy()) are kept so
+    code written against the old list-of-dicts layout keeps working.
+    Blocks are values: b["power"] = ... raises TypeError, use replace().
+    """
+    __slots__ = ()
+    type = None
+    _fields = ()
+
+    # ---- dict compatibility ----
+    def __getitem__(self, key):
+        if key == "type":
+            return self.type
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        # Workouts keep running totals, caches and undo deltas that share
+        # block objects, so an in-place change would silently corrupt them
+        raise TypeError(f"{self.type} blocks can't be changed in place; "
+                        f"use Workout.edit_block() or block.replace({key}=...)")
+
+    def __contains__(self, key):
+        return key == "type" or key in self._fields
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return ("type",) + self._fields
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def copy(self):
+        return self.replace()
+
+    def replace(self, **changes):
+        """Return a new block of the same type with some fields changed"""
+        params = {name: getattr(self, name) for name in self._fields}
+        params.update(changes)
+        return type(self)(**params)
+
+    def key(self):
+        """Hashable value of the block: (type, *fields)"""
+        return (self.type,) + tuple(getattr(self, f) for f in self._fields)
+
+    def __eq__(self, other):
+        if not isinstance(other, Block):
+            return NotImplemented
+        return self.key() == other.key()
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    # ---- derived values ----
+    relative = False  # True when intensity is stored as a ratio of FTP
+
+    @property
+    def seconds(self) -> int:
+        return 0
+
+    def avg_watts(self, ftp=None) -> float:
+        return 0.0
+
+
+class SteadyBlock(Block):
+    """
+    Steady-state block. Intensity is either absolute (power in watts) or
+    relative (ratio of FTP, power None); zone-mode blocks are relative, so
+    an FTP change never has to touch them.
+    """
+    __slots__ = ("zone", "duration", "power", "power_mode", "ratio")
+    type = "steady"
+    _fields = ("zone", "duration", "power", "power_mode", "ratio")
+
+    def __init__(self, zone="Z1", duration=0, power=0, power_mode="custom", ratio=None):
+        self.zone = sys.intern(str(zone).upper())
+        self.duration = to_seconds(duration)
+        self.power_mode = sys.intern(str(power_mode))
+        if ratio is None and self.power_mode == "zone":
+            ratio = ZONE_TARGETS.get(self.zone)
+        if ratio is not None:
+            self.ratio = float(ratio)
+            self.power = None
+            if self.ratio < 0:
+                raise ValueError("Intensity cannot be negative")
+        else:
+            self.ratio = None
+            self.power = int(power)
+            if self.power < 0:
+                raise ValueError("Power cannot be negative")
+        if self.duration < 0:
+            raise ValueError("Duration cannot be negative")
+
+    @property
+    def relative(self) -> bool:
+        return self.ratio is not None
+
+    @property
+    def seconds(self) -> int:
+        return self.duration
+
+    def watts(self, ftp) -> int:
+        """Target watts at the given FTP"""
+        if self.ratio is None:
+            return self.power
+        return int(ftp * self.ratio) if ftp else 0
+
+    def avg_watts(self, ftp=None) -> float:
+        if self.ratio is None:
+            return self.power
+        return ftp * self.ratio if ftp else 0.0
+
+
+class RampBlock(Block):
+    __slots__ = ("power_start", "power_end", "duration")
+    _fields = ("power_start", "power_end", "duration")
+
+    def __init__(self, power_start=0, power_end=0, duration=0):
+        self.power_start = int(power_start)
+        self.power_end = int(power_end)
+        self.duration = to_seconds(duration)
+        if self.power_start < 0 or self.power_end < 0:
+            raise ValueError("Power cannot be negative")
+        if self.duration < 0:
+            raise ValueError("Duration cannot be negative")
+
+    @property
+    def seconds(self) -> int:
+        return self.duration
+
+    def avg_watts(self, ftp=None) -> float:
+        return (self.power_start + self.power_end) / 2
+
+
+class WarmupBlock(RampBlock):
+    __slots__ = ()
+    type = "warmup"
+
+
+class CooldownBlock(RampBlock):
+    __slots__ = ()
+    type = "cooldown"
+
+
+class IntervalBlock(Block):
+    __slots__ = ("power1", "dur1", "power2", "dur2", "reps")
+    type = "interval"
+    _fields = ("power1", "dur1", "power2", "dur2", "reps")
+
+    def __init__(self, power1=0, dur1=0, power2=0, dur2=0, reps=1):
+        self.power1 = int(power1)
+        self.dur1 = to_seconds(dur1)
+        self.power2 = int(power2)
+        self.dur2 = to_seconds(dur2)
+        self.reps = int(reps)
+        if self.power1 < 0 or self.power2 < 0:
+            raise ValueError("Power cannot be negative")
+        if self.dur1 < 0 or self.dur2 < 0:
+            raise ValueError("Duration cannot be negative")
+        if self.reps < 1:
+            raise ValueError("Interval reps must be at least 1")
+
+    @property
+    def seconds(self) -> int:
+        return (self.dur1 + self.dur2) * self.reps
+
+    def avg_watts(self, ftp=None) -> float:
+        total = self.dur1 + self.dur2
+        if not total:
+            return 0.0
+        return (self.power1 * self.dur1 + self.power2 * self.dur2) / total
+
+
+class RepeatBlock(Block):
+    """
+    A segment of blocks repeated count times (nestable). Children are
+    shared, not copied, so memory grows with distinct content rather
+    than with the repeat count.
+    """
+    __slots__ = ("blocks", "count", "_seconds")
+    type = "repeat"
+    _fields = ("blocks", "count")
+
+    def __init__(self, blocks=(), count=1):
+        self.blocks = tuple(blocks)
+        self.count = int(count)
+        if not self.blocks:
+            raise ValueError("Repeat needs at least one block")
+        if not all(isinstance(b, Block) for b in self.blocks):
+            raise ValueError("Repeat can only contain blocks")
+        if self.count < 1:
+            raise ValueError("Repeat count must be at least 1")
+        self._seconds = sum(b.seconds for b in self.blocks) * self.count
+
+    def key(self):
+        return (self.type, tuple(b.key() for b in self.blocks), self.count)
+
+    def to_dict(self):
+        return {"type": self.type, "blocks": [b.to_dict() for b in self.blocks],
+                "count": self.count}
+
+    @property
+    def seconds(self) -> int:
+        return self._seconds
+
+    def avg_watts(self, ftp=None) -> float:
+        once = self._seconds // self.count
+        if not once:
+            return 0.0
+        return sum(b.avg_watts(ftp) * b.seconds for b in self.blocks) / once
+
+
+def iter_leaves(blocks):
+    """Yield non-repeat blocks depth first, visiting each repeat's children once"""
+    for b in blocks:
+        if b.type == "repeat":
+            yield from iter_leaves(b.blocks)
+        else:
+            yield b
+
+
+BLOCK_TYPES = {
+    "steady": SteadyBlock,
+    "warmup": WarmupBlock,
+    "cooldown": CooldownBlock,
+    "interval": IntervalBlock,
+    "repeat": RepeatBlock,
+}
+
+
+def make_block(block_type, **params):
+    """Build a typed block from add_block-style parameters"""
+    cls = BLOCK_TYPES.get(block_type)
+    if cls is None:
+        raise ValueError(f"Invalid block type: {block_type}")
+    return cls(**params)
+
+
+def from_dict(d):
+    """Build a typed block from a legacy block dict"""
+    params = {k: v for k, v in d.items() if k != "type"}
+    if d.get("type") == "repeat":
+        params["blocks"] = [from_dict(c) for c in params.get("blocks", ())]
+    return make_block(d.get("type", "steady"), **params)
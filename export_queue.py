@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+
+# Exports allowed to run at the same time
+MAX_WORKERS = 2
+
+
+class ExportQueue:
+    """
+    Runs export jobs on background threads so the REPL never waits on
+    rendering or disk. Jobs should work on a Workout.snapshot(), since the
+    live workout keeps changing while they run. At most max_workers jobs
+    run at once; the rest wait in the pool's queue. Each finished job
+    leaves a notice for the REPL to print at its next prompt.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.max_workers = max_workers
+        self._pool = None
+        self._notices = queue.SimpleQueue()
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, label, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs). Its result (a path or list of paths) is
+        reported as a notice labelled label; exceptions become error notices.
+        """
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="zwerminal-export")
+        future = self._pool.submit(self._run, label, fn, args, kwargs)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _run(self, label, fn, args, kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._notices.put((False, label, str(e), time.perf_counter() - start))
+            raise
+        self._notices.put((True, label, result, time.perf_counter() - start))
+        return result
+
+    def _done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def pending(self) -> int:
+        """Jobs queued or running"""
+        with self._lock:
+            return len(self._futures)
+
+    def notices(self):
+        """Finished jobs since the last call: (ok, label, result or error, seconds)"""
+        done = []
+        while True:
+            try:
+                done.append(self._notices.get_nowait())
+            except queue.Empty:
+                return done
+
+    def wait(self):
+        """Block until every queued job has finished"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            try:
+                future.result()
+            except Exception:
+                pass  # reported through notices()
+
+    def shutdown(self):
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
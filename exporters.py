@@ -0,0 +1,137 @@
+"""
+Output formats. Each backend turns a compiled ir.Program plus a ratio row
+into lines of text: backend(program, r, name, ftp) -> iterator of str.
+"""
+import os
+
+from ir import iter_flat
+
+
+def escape_xml(text):
+    """Escape XML special characters"""
+    if not isinstance(text, str):
+        text = str(text)
+    return (text.replace("&", "&amp;")
+               .replace("<", "&lt;")
+               .replace(">", "&gt;")
+               .replace('"', "&quot;")
+               .replace("'", "&#39;"))
+
+
+# ---- Zwift .zwo ----
+def _zwo_element(seg, r):
+    kind = seg.kind
+    if kind == "steady":
+        return f'    <SteadyState Duration="{seg.duration}" Power="{r[seg.lo]}" pace="0"/>\n'
+    if kind == "warmup":
+        return (f'    <Warmup Duration="{seg.duration}" PowerLow="{r[seg.lo]}" '
+                f'PowerHigh="{r[seg.hi]}" pace="0"/>\n')
+    if kind == "cooldown":
+        # Note: reversed for cooldown
+        return (f'    <Cooldown Duration="{seg.duration}" PowerLow="{r[seg.hi]}" '
+                f'PowerHigh="{r[seg.lo]}" pace="0"/>\n')
+    return (f'    <IntervalsT Repeat="{seg.reps}" OnDuration="{seg.on}" OffDuration="{seg.off}" '
+            f'OnPower="{r[seg.lo]}" OffPower="{r[seg.hi]}" pace="0"/>\n')
+
+
+def _zwo_elements(nodes, r):
+    for node in nodes:
+        if node.kind == "repeat":
+            lines = list(_zwo_elements(node.children, r))  # rendered once per repeat
+            for _ in range(node.count):
+                yield from lines
+        else:
+            yield _zwo_element(node, r)
+
+
+def zwo_lines(program, r, name, ftp=None):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield "<workout_file>\n"
+    yield f"  <name>{escape_xml(name)}</name>\n"
+    yield "  <description></description>\n"
+    yield "  <sportType>bike</sportType>\n"
+    yield "  <tags/>\n"
+    yield "  <workout>\n"
+    yield from _zwo_elements(program.nodes, r)
+    yield "  </workout>\n"
+    yield "</workout_file>\n"
+
+
+# ---- .erg (watts) / .mrc (% of FTP) ----
+def _points(program, r):
+    """(second, start ratio, end ratio) for each straight piece of the course"""
+    for t, seg in iter_flat(program.nodes):
+        kind = seg.kind
+        if kind == "intervals":
+            on_p, off_p = r[seg.lo], r[seg.hi]
+            for _ in range(seg.reps):
+                yield t, on_p, on_p, seg.on
+                t += seg.on
+                yield t, off_p, off_p, seg.off
+                t += seg.off
+        elif kind == "steady":
+            yield t, r[seg.lo], r[seg.lo], seg.duration
+        else:
+            yield t, r[seg.lo], r[seg.hi], seg.duration
+
+
+def _course_lines(program, r, name, header, value):
+    yield "[COURSE HEADER]\n"
+    yield "VERSION = 2\n"
+    yield "UNITS = ENGLISH\n"
+    yield f"DESCRIPTION = {name}\n"
+    yield f"FILE NAME = {name}\n"
+    yield from header
+    yield "[END COURSE HEADER]\n"
+    yield "[COURSE DATA]\n"
+    # Three decimals keep every offset within 0.03 s; two could drift by 0.3 s
+    for t, p0, p1, d in _points(program, r):
+        yield f"{t / 60:.3f}\t{value(p0)}\n{(t + d) / 60:.3f}\t{value(p1)}\n"
+    yield "[END COURSE DATA]\n"
+
+
+def erg_lines(program, r, name, ftp):
+    if not ftp or ftp <= 0:
+        raise ValueError("FTP must be set to write an ERG file")
+    return _course_lines(program, r, name, (f"FTP = {ftp}\n", "MINUTES WATTS\n"),
+                         lambda p: round(p * ftp))
+
+
+def mrc_lines(program, r, name, ftp=None):
+    return _course_lines(program, r, name, ("MINUTES PERCENT\n",),
+                         lambda p: f"{p * 100:.1f}")
+
+
+# ---- CSV power timeline, one row per second ----
+def csv_lines(program, r, name, ftp):
+    """
+    second,watts,ftp_ratio rows. Ramps are sampled at each second's
+    midpoint, like metrics.power_stream.
+    """
+    if not ftp or ftp <= 0:
+        raise ValueError("FTP must be set to write a CSV timeline")
+    yield "second,watts,ftp_ratio\n"
+    for t, p0, p1, d in _points(program, r):
+        if p0 == p1:
+            row = f"{p0 * ftp:.1f},{p0:.4f}\n"
+            yield "".join(f"{t + k},{row}" for k in range(d))
+        else:
+            step = (p1 - p0) / d
+            yield "".join(
+                f"{t + k},{(p0 + step * (k + 0.5)) * ftp:.1f},{p0 + step * (k + 0.5):.4f}\n"
+                for k in range(d)
+            )
+
+
+FORMATS = {
+    "zwo": zwo_lines,
+    "erg": erg_lines,
+    "mrc": mrc_lines,
+    "csv": csv_lines,
+}
+
+
+def format_for_path(path, default="zwo"):
+    """Output format named by a file extension, or default when there is none"""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    return ext if ext in FORMATS else default
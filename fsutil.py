@@ -0,0 +1,26 @@
+import os
+
+
+def atomic_write(path, write, sync=True, newline=None):
+    """
+    Call write(f) on a UTF-8 temp file next to path and os.replace it into
+    place, so a crash never leaves a half-written file. sync: fsync first.
+    """
+    import tempfile  # deferred: costs more to import than the rest of startup needs
+
+    dir_path = os.path.dirname(path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path or ".", prefix=".zwerminal-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline=newline) as f:
+            write(f)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files as 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
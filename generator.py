@@ -0,0 +1,265 @@
+"""Workout synthesis for `generate`: branch-and-bound search over work sets"""
+import heapq
+import math
+from collections import namedtuple
+
+import metrics
+from blocks import CooldownBlock, IntervalBlock, SteadyBlock, WarmupBlock
+from parallel import parallel_map
+from zones import DEFAULT_MODEL
+
+# (zone, on seconds, off seconds) of the interval sets tried
+INTERVAL_TEMPLATES = (
+    ("Z6", 30, 30), ("Z6", 40, 20), ("Z6", 60, 60),
+    ("Z5", 120, 120), ("Z5", 180, 180), ("Z5", 240, 120), ("Z5", 300, 150),
+    ("Z4", 480, 120), ("Z4", 600, 300), ("Z4", 720, 180), ("Z4", 900, 300), ("Z4", 1200, 300),
+    ("Z3", 900, 300), ("Z3", 1200, 300),
+)
+
+# Longest single steady effort tried per zone, and most work time per set
+STEADY_MAX = {"Z3": 2400, "Z4": 1200, "Z5": 480}
+SET_WORK_MAX = {"Z3": 3600, "Z4": 2400, "Z5": 1500, "Z6": 720}
+STEADY_STEP = 300
+
+# Progressive ramps: (from zone, to zone, seconds)
+RAMP_TEMPLATES = (("Z2", "Z4", 600), ("Z2", "Z4", 900), ("Z3", "Z5", 600), ("Z2", "Z5", 1200))
+
+RECOVERY_ZONE = "Z1"   # between sets and the off part of intervals
+SET_GAP = 240          # recovery seconds between two sets
+
+# Endurance filler power range as a fraction of FTP
+FILL_MIN = 0.45
+FILL_MAX = 0.75
+FILL_DEFAULT = 0.65
+
+# Score weights: per block of the session and per TSS / zone error
+BLOCK_PENALTY = 0.005
+
+# Search pruning allows this much error before giving up on a branch
+TSS_SLACK = 0.10    # fraction of the TSS target
+ZONE_SLACK = 120    # seconds per zone target
+
+
+class Option(namedtuple("Option", "seconds tss zone_sec blocks text shape")):
+    """
+    One work set: its blocks and their summed aggregates. shape is the
+    template, without its length or rep count.
+    """
+    __slots__ = ()
+
+
+class Candidate(namedtuple("Candidate", "score blocks seconds tss time_in_zone description")):
+    """A generated session; lower score is better"""
+    __slots__ = ()
+
+
+def _tss(blocks, ftp) -> float:
+    """Contribution to Workout.estimate_tss: per-block IF^2 * sec / 36"""
+    total = 0.0
+    for b in blocks:
+        r = b.ratio if b.relative else b.avg_watts() / ftp
+        total += r * r * b.seconds
+    return total / 36
+
+
+def _option(blocks, ftp, model, text, shape=()) -> Option:
+    zone_sec = model.time_in_zones(metrics.power_stream(blocks, ftp), ftp)
+    return Option(sum(b.seconds for b in blocks), _tss(blocks, ftp), tuple(zone_sec),
+                  tuple(blocks), text, shape)
+
+
+def _fmt(sec) -> str:
+    if sec % 60:
+        return f"{sec}s" if sec < 60 else f"{sec // 60}:{sec % 60:02d}"
+    return f"{sec // 60}min"
+
+
+_options_cache = {}  # (ftp, model name) -> [Option] sorted by seconds
+
+
+def options(ftp, model=DEFAULT_MODEL):
+    """Every work set tried at this FTP, sorted by length (cached)"""
+    key = (ftp, model.name)
+    cached = _options_cache.get(key)
+    if cached is not None:
+        return cached
+
+    watts = lambda zone: int(ftp * model.target(zone))  # noqa: E731
+    rest = watts(RECOVERY_ZONE)
+    found = []
+    for zone, top in STEADY_MAX.items():
+        for sec in range(STEADY_STEP, top + 1, STEADY_STEP):
+            b = SteadyBlock(zone=zone, duration=sec, power_mode="zone", ratio=model.target(zone))
+            found.append(_option([b], ftp, model, f"{_fmt(sec)} {zone}", ("steady", zone)))
+    for zone, on, off in INTERVAL_TEMPLATES:
+        for reps in range(2, SET_WORK_MAX[zone] // on + 1):
+            b = IntervalBlock(power1=watts(zone), dur1=on, power2=rest, dur2=off, reps=reps)
+            found.append(_option([b], ftp, model, f"{reps}×{_fmt(on)} {zone}/{_fmt(off)}",
+                                 ("intervals", zone, on, off)))
+    for lo, hi, sec in RAMP_TEMPLATES:
+        b = WarmupBlock(power_start=watts(lo), power_end=watts(hi), duration=sec)
+        found.append(_option([b], ftp, model, f"ramp {_fmt(sec)} {lo}→{hi}", ("ramp", lo, hi)))
+    found.sort(key=lambda o: o.seconds)
+    _options_cache[key] = found
+    return found
+
+
+def bookends(seconds, ftp):
+    """Warmup and cooldown ramps sized to the session (about 1/6 and 1/10 of it)"""
+    warm = max(300, min(900, seconds // 6 // 60 * 60))
+    cool = max(180, min(600, seconds // 10 // 60 * 60))
+    return (WarmupBlock(power_start=int(ftp * 0.45), power_end=int(ftp * 0.75), duration=warm),
+            CooldownBlock(power_start=int(ftp * 0.70), power_end=int(ftp * 0.45), duration=cool))
+
+
+def generate(seconds, ftp, tss=None, zone_targets=None, model=DEFAULT_MODEL,
+             count=5, max_sets=2):
+    """
+    Up to count ranked Candidates lasting exactly seconds.
+    tss: target estimated TSS (None: endurance filler at Z2)
+    zone_targets: {zone label: seconds} to spend in those zones
+    """
+    if not ftp or ftp <= 0:
+        raise ValueError("FTP must be set to generate a workout")
+    targets = {}
+    for label, sec in (zone_targets or {}).items():
+        if str(label).upper() not in model.labels:
+            raise ValueError(f"Invalid zone: {label}")
+        targets[model.labels.index(str(label).upper())] = sec
+    warm, cool = bookends(seconds, ftp)
+    base = _option([warm, cool], ftp, model, "")
+    main = seconds - base.seconds
+    if main < 0:
+        raise ValueError(f"Too short: warmup and cooldown alone take {_fmt(base.seconds)}")
+
+    found = _search(main, base, ftp, model, tss, targets, count, max_sets, prune=True)
+    if not found:  # nothing close enough to prune against; rank everything
+        found = _search(main, base, ftp, model, tss, targets, count, max_sets, prune=False)
+
+    gap = _gap(ftp, model)
+    results = []
+    for neg_score, _, chosen, fill_watts in found:
+        blocks = [warm]
+        for k, o in enumerate(chosen):
+            if k:
+                blocks.extend(gap.blocks)
+            blocks.extend(o.blocks)
+        rest = main - sum(o.seconds for o in chosen) - gap.seconds * max(0, len(chosen) - 1)
+        text = [o.text for o in chosen]
+        if rest > 0:
+            blocks.append(SteadyBlock(zone="AUTO", duration=rest, power=fill_watts))
+            text.append(f"{_fmt(rest)} @ {fill_watts}W")
+        blocks.append(cool)
+        stream = metrics.power_stream(blocks, ftp)
+        results.append(Candidate(-neg_score, tuple(blocks), len(stream), round(_tss(blocks, ftp), 1),
+                                 model.time_in_zones(stream, ftp), " + ".join(text) or "endurance"))
+    return results
+
+
+def _gap(ftp, model):
+    b = SteadyBlock(zone=RECOVERY_ZONE, duration=SET_GAP, power_mode="zone",
+                    ratio=model.target(RECOVERY_ZONE))
+    return _option([b], ftp, model, "")
+
+
+def _search(main, base, ftp, model, target_tss, targets, count, max_sets, prune):
+    """
+    Branch and bound over work sets. Returns the count best
+    (-score, tiebreak, sets, filler watts), at most one per combination of
+    set shapes, so candidates differ by more than a rep count.
+    """
+    opts = [o for o in options(ftp, model) if o.seconds <= main]
+    gap = _gap(ftp, model)
+    zones = tuple(targets.items())
+    tss_slack = TSS_SLACK * target_tss if target_tss else 0.0
+    fill_default = FILL_DEFAULT if target_tss is None else None
+    # TSS per second bounds of anything that can still be added
+    rates = [o.tss / o.seconds for o in opts] + [FILL_MIN ** 2 / 36, FILL_MAX ** 2 / 36]
+    rate_lo, rate_hi = min(rates), max(rates)
+    best = {}  # shapes of the chosen sets -> best item
+    tiebreak = [0]
+
+    def leaf(sec, tss, zone_sec, chosen):
+        rest = main - sec
+        if rest > 0:
+            if fill_default is not None:
+                ratio = fill_default
+            else:
+                need = max(0.0, target_tss - tss)
+                ratio = min(FILL_MAX, max(FILL_MIN, math.sqrt(need * 36 / rest)))
+            fill_watts = int(ftp * ratio)
+            r = fill_watts / ftp
+            tss += r * r * rest / 36
+            fill_zone = model.index(fill_watts, ftp)
+        else:
+            fill_watts, fill_zone = 0, -1
+        score = BLOCK_PENALTY * (len(chosen) * 2 + (rest > 0))
+        if target_tss:
+            score += abs(tss - target_tss) / target_tss
+        for z, want in zones:
+            have = zone_sec[z] + (rest if z == fill_zone else 0)
+            score += abs(have - want) / (main or 1)
+        tiebreak[0] += 1
+        item = (-score, tiebreak[0], tuple(chosen), fill_watts)
+        shapes = tuple(sorted(o.shape for o in chosen))
+        if shapes not in best or item > best[shapes]:
+            best[shapes] = item
+
+    def visit(start, sec, tss, zone_sec, chosen):
+        leaf(sec, tss, zone_sec, chosen)
+        if len(chosen) == max_sets:
+            return
+        extra = gap.seconds if chosen else 0
+        for i in range(start, len(opts)):
+            o = opts[i]
+            n_sec = sec + o.seconds + extra
+            if n_sec > main:
+                break  # options are sorted by length
+            n_tss = tss + o.tss + (gap.tss if chosen else 0.0)
+            n_zone = tuple(a + b + (g if chosen else 0)
+                           for a, b, g in zip(zone_sec, o.zone_sec, gap.zone_sec))
+            if prune:
+                rest = main - n_sec
+                if target_tss:
+                    if n_tss + rest * rate_lo > target_tss + tss_slack:
+                        continue
+                    if n_tss + rest * rate_hi < target_tss - tss_slack:
+                        continue
+                short = 0
+                over = False
+                for z, want in zones:
+                    if n_zone[z] > want + ZONE_SLACK:
+                        over = True
+                        break
+                    short += max(0, want - n_zone[z] - ZONE_SLACK)
+                if over or short > rest:
+                    continue
+            chosen.append(o)
+            visit(i + 1, n_sec, n_tss, n_zone, chosen)
+            chosen.pop()
+
+    visit(0, 0, base.tss, base.zone_sec, [])
+    return heapq.nlargest(count, best.values())
+
+
+def generate_batch(specs, ftp, model=DEFAULT_MODEL, max_sets=2, jobs=None):
+    """
+    Best candidate for each spec: (name, seconds, tss, {zone: seconds}).
+    Returns [(name, Candidate or None, error or None)]; large batches are
+    split across a process pool.
+    """
+    return parallel_map(_generate_chunk, specs, ftp, model.name, max_sets, jobs=jobs)
+
+
+def _generate_chunk(specs, ftp, model_name, max_sets):
+    """Best candidate for each of some batch specs (process pool worker)"""
+    from zones import MODELS
+    results = []
+    for name, seconds, tss, zone_targets in specs:
+        try:
+            found = generate(seconds, ftp, tss, zone_targets, MODELS[model_name], 1, max_sets)
+        except ValueError as e:
+            results.append((name, None, str(e)))
+            continue
+        results.append((name, (found[0] if found else None), None))
+    return results
@@ -0,0 +1,114 @@
+import functools
+import threading
+import time
+
+tracemalloc = None  # imported by enable(), so importing this module stays cheap
+
+# Instrumentation is off by default and then costs nothing: enable() wraps
+# the target functions in place and disable() puts the originals back.
+enabled = False
+
+# name -> [calls, total seconds, max seconds, net bytes, peak bytes or None]
+stats = {}
+
+_patched = []  # (owner, attribute, original)
+_depth = 0
+_thread = None  # ident of the thread that called enable(); only its calls are recorded
+
+
+class measure:
+    """
+    Context manager recording wall time and allocations under name.
+    Peak allocation is only tracked for the outermost measurement, since
+    tracemalloc has a single peak counter.
+    """
+    __slots__ = ("name", "start", "mem", "outer")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        global _depth
+        self.outer = _depth == 0
+        _depth += 1
+        if self.outer:
+            tracemalloc.reset_peak()
+        self.mem = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _depth
+        elapsed = time.perf_counter() - self.start
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+        else:  # disabled during the call (`stats off`)
+            current = peak = self.mem
+        _depth -= 1
+        entry = stats.get(self.name)
+        if entry is None:
+            entry = stats[self.name] = [0, 0.0, 0.0, 0, None]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+        entry[3] += current - self.mem
+        if self.outer:
+            entry[4] = max(entry[4] or 0, peak - self.mem)
+        return False
+
+
+def _wrap(fn, name):
+    # Calls from other threads (background exports) run unrecorded: _depth,
+    # stats and the tracemalloc peak are shared, so they would skew the
+    # command being measured on the REPL thread.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if threading.get_ident() != _thread:
+            return fn(*args, **kwargs)
+        with measure(name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def enable(targets):
+    """
+    Start recording on the calling thread. targets: (owner, attribute)
+    pairs of plain functions or methods to time, e.g. (Workout, "export")
+    or (module, "display_timeline").
+    """
+    global enabled, tracemalloc, _thread
+    if enabled:
+        return
+    import tracemalloc
+    tracemalloc.start()
+    _thread = threading.get_ident()
+    for owner, attr in targets:
+        original = getattr(owner, attr)
+        label = f"{owner.__name__}.{attr}" if isinstance(owner, type) else attr
+        setattr(owner, attr, _wrap(original, label))
+        _patched.append((owner, attr, original))
+    enabled = True
+
+
+def disable():
+    """Stop recording and restore the original functions (stats are kept)"""
+    global enabled
+    if not enabled:
+        return
+    for owner, attr, original in reversed(_patched):
+        setattr(owner, attr, original)
+    _patched.clear()
+    tracemalloc.stop()
+    enabled = False
+
+
+def reset():
+    stats.clear()
+
+
+def report():
+    """Rows of (name, calls, total s, mean s, max s, net bytes, peak bytes), slowest total first"""
+    rows = [(name, calls, total, total / calls, worst, net, peak)
+            for name, (calls, total, worst, net, peak) in stats.items()]
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return rows
@@ -0,0 +1,127 @@
+from collections import namedtuple  # typing.NamedTuple would add typing to startup
+
+
+class Segment(namedtuple("Segment", "kind start duration lo hi reps on off",
+                         defaults=(1, 0, 0))):
+    """
+    One workout element: a steady block, a ramp or on/off intervals.
+
+    kind      "steady", "warmup", "cooldown" or "intervals"
+    start     seconds from the start (first pass through enclosing repeats)
+    duration  seconds, all reps included
+    lo        ratio slot: steady power, ramp start or on power
+    hi        ratio slot: ramp end or off power (unused for steady)
+    reps      interval reps (1 otherwise)
+    on, off   on/off seconds of one interval rep
+    """
+    __slots__ = ()
+
+
+class Repeat(namedtuple("Repeat", "kind start duration count period children")):
+    """
+    Child nodes played count times back to back.
+
+    kind      "repeat"
+    duration  seconds, all passes included
+    period    seconds of one pass
+    """
+    __slots__ = ()
+
+
+class Program(namedtuple("Program", "nodes seconds elements slots")):
+    """
+    A block list compiled for export: absolute start offsets and seconds,
+    with intensities as slots into a ratio row (Workout.ratio_row), so one
+    compile serves every FTP and output format. Repeats that a single
+    IntervalsT can express are already folded into intervals segments.
+
+    elements  workout elements once repeats are expanded
+    slots     length of the ratio rows this program reads
+    """
+    __slots__ = ()
+
+
+def compile_blocks(blocks):
+    """Compile typed blocks into a Program (leaf slots follow iter_leaves order)"""
+    cursor = [0]
+    nodes, seconds, elements = _compile(blocks, 0, cursor, top=True)
+    return Program(tuple(nodes), seconds, elements, 2 * cursor[0])
+
+
+def _compile(blocks, t, cursor, top=False):
+    nodes = []
+    start = t
+    elements = 0
+    for i, b in enumerate(blocks):
+        try:
+            node, n = _compile_block(b, t, cursor)
+        except Exception as e:
+            if not top:
+                raise
+            # Log the error but continue processing other blocks
+            print(f"Warning: Skipping block {i} due to error: {e}")
+            continue
+        if node is not None:
+            nodes.append(node)
+            t += node.duration
+            elements += n
+    return nodes, t - start, elements
+
+
+def _compile_block(b, t, cursor):
+    """(node, element count) for one block; node is None when it is skipped"""
+    if b.type == "repeat":
+        first = cursor[0]
+        children, period, n = _compile(b.blocks, t, cursor)
+        if not children:
+            return None, 0
+        collapsed = _collapse_repeat(b, children, t, first)
+        if collapsed is not None:
+            return collapsed, 1
+        return Repeat("repeat", t, period * b.count, b.count, period, tuple(children)), n * b.count
+
+    i = cursor[0]
+    cursor[0] += 1
+    btype = b.type
+    if btype == "steady":
+        if b.duration <= 0:
+            return None, 0  # Skip invalid blocks
+        return Segment("steady", t, b.duration, 2 * i, 2 * i + 1), 1
+    if btype in ("warmup", "cooldown"):
+        if b.duration <= 0:
+            return None, 0
+        return Segment(btype, t, b.duration, 2 * i, 2 * i + 1), 1
+    if btype == "interval":
+        if b.dur1 <= 0 or b.dur2 <= 0:
+            return None, 0  # Skip invalid intervals
+        return Segment("intervals", t, b.seconds, 2 * i, 2 * i + 1, b.reps, b.dur1, b.dur2), 1
+    return None, 0
+
+
+def _collapse_repeat(b, children, t, first):
+    """
+    One intervals segment for a repeat of one on/off steady pair or of one
+    interval block (first = the children's first leaf slot); None when the
+    pattern doesn't allow it.
+    """
+    kids = b.blocks
+    if len(children) != len(kids) or any(c.kind == "repeat" for c in children):
+        return None  # nested repeats or skipped blocks
+    if len(kids) == 2 and kids[0].type == "steady" and kids[1].type == "steady":
+        on, off = kids[0].duration, kids[1].duration
+        return Segment("intervals", t, (on + off) * b.count, 2 * first, 2 * first + 2,
+                       b.count, on, off)
+    if len(kids) == 1 and kids[0].type == "interval":
+        k = children[0]
+        return k._replace(duration=k.duration * b.count, reps=k.reps * b.count)
+    return None
+
+
+def iter_flat(nodes, shift=0):
+    """Yield (absolute start, Segment) for every element, expanding repeats"""
+    for node in nodes:
+        if node.kind == "repeat":
+            for k in range(node.count):
+                yield from iter_flat(node.children, shift + k * node.period)
+        else:
+            yield node.start + shift, node
@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import xml.etree.ElementTree as ET
+
+from parallel import parallel_map
+from workout import Workout, ZONE_BOUNDS
+
+# ZWO files store intensities as ratios of FTP, so IF, TSS and zone time
+# don't depend on the rider; files are loaded at a high nominal FTP to
+# keep watt rounding negligible.
+CATALOG_FTP = 1000
+
+ZONE_COLUMNS = tuple(f"z{i}_sec" for i in range(1, len(ZONE_BOUNDS) + 2))
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS workouts (
+    path      TEXT PRIMARY KEY,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    name      TEXT,
+    seconds   INTEGER,
+    intensity REAL,
+    tss       REAL,
+    blocks    INTEGER,
+    {", ".join(f"{c} INTEGER" for c in ZONE_COLUMNS)},
+    error     TEXT
+);
+CREATE INDEX IF NOT EXISTS workouts_seconds ON workouts (seconds, tss);
+CREATE INDEX IF NOT EXISTS workouts_tss ON workouts (tss);
+CREATE INDEX IF NOT EXISTS workouts_intensity ON workouts (intensity);
+"""
+
+COLUMNS = ("path", "mtime_ns", "size", "name", "seconds", "intensity", "tss",
+           "blocks") + ZONE_COLUMNS + ("error",)
+
+
+def connect(db_path):
+    """Open (and create if needed) a library catalog"""
+    dir_path = os.path.dirname(db_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def zwo_name(path):
+    """<name> of a .zwo file, read without parsing the rest of it"""
+    try:
+        for _, elem in ET.iterparse(path):
+            if elem.tag.lower() == "name":
+                return (elem.text or "").strip()
+            if elem.tag.lower() == "workout":
+                break
+    except ET.ParseError:
+        pass
+    return ""
+
+
+def _index_one(path, mtime_ns, size):
+    """Catalog row for one file (process pool worker)"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        w = Workout.from_zwo(path, CATALOG_FTP)
+        m = w.metrics()
+    except (OSError, ValueError) as e:
+        return (path, mtime_ns, size, name, None, None, None, None) \
+            + (None,) * len(ZONE_COLUMNS) + (str(e),)
+    return (path, mtime_ns, size, zwo_name(path) or name, m["seconds"], m["if"],
+            m["tss"], len(w.blocks)) + tuple(m["time_in_zone"]) + (None,)
+
+
+def _index_chunk(entries):
+    return [_index_one(*e) for e in entries]
+
+
+def scan(root):
+    """{absolute path: (mtime_ns, size)} for every .zwo file under root"""
+    found = {}
+    for dirpath, _, names in os.walk(root):
+        for n in names:
+            if n.lower().endswith(".zwo"):
+                path = os.path.abspath(os.path.join(dirpath, n))
+                st = os.stat(path)
+                found[path] = (st.st_mtime_ns, st.st_size)
+    return found
+
+
+def reindex(db_path, root, jobs=None):
+    """
+    Bring the catalog up to date with the .zwo files under root.
+    Only files whose mtime or size changed are parsed (across a process
+    pool when there are many); entries for deleted files are dropped.
+    Returns counts: {"added", "updated", "removed", "unchanged", "failed"}.
+    """
+    if not os.path.isdir(root):
+        raise ValueError(f"Not a directory: {root}")
+    found = scan(root)
+    prefix = os.path.join(os.path.abspath(root), "")
+
+    conn = connect(db_path)
+    try:
+        known = {
+            row["path"]: (row["mtime_ns"], row["size"])
+            for row in conn.execute(
+                "SELECT path, mtime_ns, size FROM workouts WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix))
+        }
+        stale = [(p, *stat) for p, stat in found.items() if known.get(p) != stat]
+        removed = [(p,) for p in known if p not in found]
+
+        rows = parallel_map(_index_chunk, stale, jobs=jobs, max_chunk=256)
+
+        with conn:
+            conn.executemany("DELETE FROM workouts WHERE path = ?", removed)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO workouts ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+    finally:
+        conn.close()
+
+    updated = sum(1 for p, *_ in stale if p in known)
+    return {
+        "added": len(stale) - updated,
+        "updated": updated,
+        "removed": len(removed),
+        "unchanged": len(found) - len(stale),
+        "failed": sum(1 for r in rows if r[-1] is not None),
+    }
+
+
+# find() filters: keyword -> column
+RANGE_COLUMNS = {"seconds": "seconds", "tss": "tss", "intensity": "intensity", "blocks": "blocks"}
+
+
+def find(db_path, ranges=None, name=None, limit=50):
+    """
+    Catalog entries matching every (low, high) range in ranges (keys from
+    RANGE_COLUMNS; either bound may be None) and an optional name
+    substring, shortest first.
+    """
+    where = ["error IS NULL"]
+    params = []
+    for key, (low, high) in (ranges or {}).items():
+        column = RANGE_COLUMNS.get(key)
+        if column is None:
+            raise ValueError(f"Unknown filter: {key}")
+        if low is not None:
+            where.append(f"{column} >= ?")
+            params.append(low)
+        if high is not None:
+            where.append(f"{column} <= ?")
+            params.append(high)
+    if name:
+        where.append("name LIKE ? ESCAPE '\\'")
+        escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params.append(f"%{escaped}%")
+
+    conn = connect(db_path)
+    try:
+        return conn.execute(
+            f"SELECT * FROM workouts WHERE {' AND '.join(where)} "
+            f"ORDER BY seconds, tss LIMIT ?", params + [limit]).fetchall()
+    finally:
+        conn.close()
@@ -1,80 +1,194 @@
 from workout import Workout
-from rich.console import Console
-from rich.table import Table
-from rich.prompt import Prompt
+from roster import load_roster, export_roster
+import session
+import instrument
+from export_queue import ExportQueue
+from parallel import parallel_map
+import exporters
+import zones
 import re
 import os
-import readline
+import sys
+import time
+import argparse
 
-console = Console()
+# Rich, readline, sqlite3 (library) and multiprocessing are imported where
+# they are used, so scripted runs don't pay for them at startup.
+
+# Rich markup tags, as matched by rich.markup
+_MARKUP_TAG = re.compile(r"(\\*)\[([a-z#/@][^[]*?)]")
+
+
+def strip_markup(text):
+    """Plain text of a Rich markup string (escaped \\[ brackets are kept)"""
+    def _sub(m):
+        backslashes, tag = m.groups()
+        kept, escaped = divmod(len(backslashes), 2)
+        return "\\" * kept + (f"[{tag}]" if escaped else "")
+    return _MARKUP_TAG.sub(_sub, text)
+
+
+class LazyConsole:
+    """
+    Stands in for rich's Console and only imports Rich once something is
+    rendered. Headless runs print plain strings with markup stripped, so
+    scripts that only print status lines never load Rich at all.
+    """
+
+    def __init__(self):
+        self._console = None
+
+    def _rich(self):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+
+    def print(self, *objects, **kwargs):
+        if not interactive and not kwargs and all(isinstance(o, str) for o in objects):
+            print(*map(strip_markup, objects))
+        else:
+            self._rich().print(*objects, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._rich(), name)
+
+
+console = LazyConsole()
 workout = Workout()
+interactive = True  # False when running scripts headlessly (no rendering/prompts)
+export_dir = "workouts"
+library_db = "library.db"  # SQLite catalog used by `library` / `find`
+plan_file = "plan.json"  # training plan used by `plan`
+training_plan = None  # plan.Plan, loaded from plan_file on first use
+exported = []  # file paths written by `export` in the current run
+candidates = []  # generator.Candidate list from the last `generate`
+autosave = None  # session.Journal while autosave is on
+exports = ExportQueue()  # background export jobs
+
+# timeline view window
+view_size = 40
+view_start = 0
+row_cache = {}  # (ftp, zone model, block.key()) -> formatted row
+
+def format_block_row(b):
+    """
+    Return the (type, info, duration, power) cells for a block.
+    Cached by block value, FTP and zone model, so an edited block simply
+    misses the cache and identical blocks are formatted once.
+    """
+    cache_key = (workout.ftp, workout.zone_model.name, b.key())
+    row = row_cache.get(cache_key)
+    if row is not None:
+        return row
+
+    btype = b.type
+    power = ""
+    dur_s = b.seconds
+    dur = f"{dur_s//60}:{str(dur_s%60).zfill(2)}"
+    
+    # --- steady blocks ---
+    if btype == "steady":
+        zone = b.zone
+        if workout.ftp:
+            power = b.watts(workout.ftp)
+        elif b.relative:
+            power = f"{b.ratio * 100:.0f}%"
+        else:
+            power = b.power
+        if zone == "AUTO" and workout.ftp is not None:
+            zone = workout._power_to_zone(power)
+        color = workout._zone_color(zone)
+        info = f"[{color}]{zone}[/{color}]"
 
-# keep command history for arrow key use
-readline.set_history_length(1000)
+    # --- ramp blocks (warmup/cooldown) ---
+    elif btype in ("warmup", "cooldown"):
+        p0 = b.power_start
+        p1 = b.power_end
+        info = f"{p0}→{p1}"
+        power = f"{p0}-{p1}"
 
-def display_timeline():
-    if not workout.blocks:
+    # --- interval blocks ---
+    elif btype == "interval":
+        p1 = b.power1
+        p2 = b.power2
+        reps = b.reps
+        info = f"{p1}/{p2}×{reps}"
+        power = f"{p1}/{p2}"
+
+    # --- repeat segments ---
+    elif btype == "repeat":
+        n = len(b.blocks)
+        info = f"{n} block{'s' if n != 1 else ''} ×{b.count}"
+        power = ""
+
+    else:
+        # Fallback (shouldn't happen)
+        info = "Unknown"
+        dur = "0:00"
+        power = "0"
+
+    row = (btype, info, dur, str(power))
+    if len(row_cache) >= 4096:
+        row_cache.clear()
+    row_cache[cache_key] = row
+    return row
+
+
+def display_timeline(start=None, end=None):
+    """
+    Render blocks start..end (inclusive; defaults to the current view
+    window) plus the summary bar. Runs of identical blocks collapse into
+    one row, so redraw cost depends on the window, not the workout length.
+    """
+    global view_start
+    n = len(workout.blocks)
+    if not n:
         console.print("[yellow]No workout blocks yet. Add some blocks to see the timeline![/]")
         return
-        
-    table = Table(title="\U0001F3C1 Workout Timeline")
+
+    if start is None:
+        start = view_start
+    if end is None:
+        end = start + view_size - 1
+    start = max(0, min(start, n - 1))
+    end = max(start, min(end, n - 1))
+    view_start = start
+
+    title = "\U0001F3C1 Workout Timeline"
+    if start > 0 or end < n - 1:
+        title += f" (blocks {start}–{end} of {n})"
+    from rich.table import Table
+    table = Table(title=title)
     table.add_column("Idx")
     table.add_column("Type")
     table.add_column("Zone/Info")
     table.add_column("Duration")
     table.add_column("Power")
 
-    for i, b in enumerate(workout.blocks):
+    i = start
+    while i <= end:
+        b = workout.blocks[i]
+        run_end = i
+        key = b.key()
+        while run_end < end and workout.blocks[run_end + 1].key() == key:
+            run_end += 1
         try:
-            btype = b.get("type", "steady")
-            power = ""
-            
-            # --- steady blocks ---
-            if btype == "steady":
-                power = b.get("power", 0)
-                zone = b.get("zone", "Z1")
-                if zone == "AUTO" and workout.ftp is not None:
-                    zone = workout._power_to_zone(power)
-                dur_s = parse_duration_to_seconds(b.get("duration", "0s"))
-                dur = f"{dur_s//60}:{str(dur_s%60).zfill(2)}"
-                color = workout._zone_color(zone)
-                info = f"[{color}]{zone}[/{color}]"
-
-            # --- ramp blocks (warmup/cooldown) ---
-            elif btype in ("warmup", "cooldown"):
-                p0 = b.get("power_start", 0)
-                p1 = b.get("power_end", 0)
-                dur_s = b.get("duration", 0)
-                dur = f"{dur_s//60}:{str(dur_s%60).zfill(2)}"
-                info = f"{p0}→{p1}"
-                power = f"{p0}-{p1}"
-
-            # --- interval blocks ---
-            elif btype == "interval":
-                p1 = b.get("power1", 0)
-                d1 = b.get("dur1", 0)
-                p2 = b.get("power2", 0)
-                d2 = b.get("dur2", 0)
-                reps = b.get("reps", 1)
-                total_s = (d1 + d2) * reps
-                dur = f"{total_s//60}:{str(total_s%60).zfill(2)}"
-                info = f"{p1}/{p2}×{reps}"
-                power = f"{p1}/{p2}"
-
+            btype, info, dur, power = format_block_row(b)
+            if run_end > i:
+                table.add_row(f"{i}–{run_end}", f"{btype} ×{run_end - i + 1}", info, dur, power)
             else:
-                # Fallback (shouldn't happen)
-                info = "Unknown"
-                dur = "0:00"
-                power = "0"
-            
-            table.add_row(str(i), btype, info, dur, str(power))
+                table.add_row(str(i), btype, info, dur, power)
             
         except Exception as e:
             # Handle corrupted block data gracefully
             table.add_row(str(i), "ERROR", str(e), "0:00", "0")
             console.print(f"[red]Warning: Block {i} has corrupted data: {e}[/]")
+        i = run_end + 1
 
     console.print(table)
+    if start > 0 or end < n - 1:
+        console.print("[dim]'next' / 'prev' to page, 'preview <start> <end>' for a range[/]")
 
     # ---- summary bar ----
     total_s = workout.total_seconds()
@@ -83,13 +197,7 @@ def display_timeline():
     secs    = total_s % 60
     hhmmss  = f"{hours:02}:{mins:02}:{secs:02}"
 
-    if_val  = (
-        round(
-            sum(workout._block_avg_ratio(b) * workout._block_seconds(b)
-                for b in workout.blocks) / total_s, 2
-        )
-        if total_s and workout.ftp else 0.0
-    )
+    if_val  = round(workout.average_if(), 2)
     tss_val = workout.estimate_tss()
 
     console.print(
@@ -98,10 +206,228 @@ def display_timeline():
         f"[bold]TSS:[/] {tss_val}"
     )
 
-def refresh_screen():
+def display_metrics():
+    """Print NP/IF/TSS, time in zone and peak powers from the per-second stream"""
+    stats = workout.metrics()
+    console.print(
+        f"[bold]Avg Power:[/] {stats['avg_power']:.0f}W    "
+        f"[bold]NP:[/] {stats['np']:.0f}W    "
+        f"[bold]IF:[/] {stats['if']:.2f}    "
+        f"[bold]TSS:[/] {stats['tss']:.1f}"
+    )
+
+    from rich.table import Table
+    table = Table(title="Time in Zone")
+    table.add_column("Zone")
+    table.add_column("Time")
+    table.add_column("%")
+    total = stats["seconds"] or 1
+    for zone, sec in zip(workout.zone_model.labels, stats["time_in_zone"]):
+        color = workout._zone_color(zone)
+        table.add_row(f"[{color}]{zone}[/{color}]", f"{sec//60}:{str(sec%60).zfill(2)}",
+                      f"{100 * sec / total:.0f}")
+    console.print(table)
+
+    peaks = "    ".join(
+        f"[bold]{w // 60}min:[/] {p:.0f}W" if w >= 60 else f"[bold]{w}s:[/] {p:.0f}W"
+        for w, p in stats["peaks"].items() if p is not None
+    )
+    if peaks:
+        console.print(f"[bold]Peak power[/]  {peaks}")
+
+# What `stats on` times besides each command
+WORKOUT_METHODS = ("add_block", "extend_blocks", "edit_block", "delete_block", "set_ftp",
+                   "undo", "redo", "optimize", "export", "to_zwo", "write_zwo",
+                   "power_stream", "metrics", "estimate_tss", "total_seconds", "average_if")
+UI_FUNCTIONS = ("display_timeline", "display_metrics", "format_block_row", "refresh_screen",
+                "parse_duration_to_seconds")
+
+
+def stats_on():
+    module = sys.modules[__name__]
+    instrument.enable([(Workout, m) for m in WORKOUT_METHODS]
+                      + [(module, f) for f in UI_FUNCTIONS])
+
+
+def display_stats():
+    """Print per-command and per-call timings recorded by `stats on`"""
+    rows = instrument.report()
+    if not rows:
+        console.print("[yellow]Nothing recorded yet. Use 'stats on' and run some commands.[/]")
+        return
+    from rich.table import Table
+    table = Table(title="Timings")
+    table.add_column("Name")
+    for col in ("Calls", "Total ms", "Mean ms", "Max ms", "Net KiB", "Peak KiB"):
+        table.add_column(col, justify="right")
+    for name, calls, total, mean, worst, net, peak in rows:
+        table.add_row(name, str(calls), f"{total * 1e3:.2f}", f"{mean * 1e3:.3f}",
+                      f"{worst * 1e3:.2f}", f"{net / 1024:.1f}",
+                      "-" if peak is None else f"{peak / 1024:.1f}")
+    console.print(table)
+
+
+def get_plan():
+    global training_plan
+    if training_plan is None:
+        import plan
+        training_plan = plan.Plan.load(plan_file)
+    return training_plan
+
+
+def plan_workout_path(name):
+    """Path of a workout named in `plan add/remove`: .zwo added, looked up in export_dir too"""
+    if not name.endswith('.zwo'):
+        name += '.zwo'
+    if not os.path.exists(name) and os.path.exists(os.path.join(export_dir, name)):
+        name = os.path.join(export_dir, name)
+    return name
+
+
+def display_plan(name=None):
+    """Per-athlete load summary, or one athlete's plan week by week"""
+    from rich.table import Table
+    p = get_plan()
+    if not p.athletes:
+        console.print("[yellow]The plan is empty. Use 'plan add <date> <file.zwo>'.[/]")
+        return
+    if name is None:
+        table = Table(title=f"Plan from {p.start} ({p.days()} days)")
+        for col in ("Athlete", "TSS", "Peak CTL", "CTL", "ATL", "TSB", "Lowest TSB"):
+            table.add_column(col, justify="left" if col == "Athlete" else "right")
+        for athlete, tss, peak, ctl, atl, tsb, low in p.summary():
+            color = "red" if low < -30 else "white"
+            table.add_row(athlete, f"{tss:.0f}", f"{peak:.1f}", f"{ctl:.1f}", f"{atl:.1f}",
+                          f"{tsb:+.1f}", f"[{color}]{low:+.1f}[/{color}]")
+    else:
+        if name not in p.athletes:
+            console.print(f"[red]Unknown athlete: {name}[/]")
+            return
+        table = Table(title=f"{name}: week by week (loads at the end of each week)")
+        for col in ("Week of", "TSS", "CTL", "ATL", "TSB"):
+            table.add_column(col, justify="left" if col == "Week of" else "right")
+        for week, tss, ctl, atl, tsb in p.weeks(name):
+            color = "red" if tsb < -30 else "green" if tsb > 5 else "white"
+            table.add_row(str(week), f"{tss:.0f}", f"{ctl:.1f}", f"{atl:.1f}",
+                          f"[{color}]{tsb:+.1f}[/{color}]")
+    console.print(table)
+
+
+def display_candidates(zone_targets):
+    """Ranked `generate` results, with time in the targeted zones"""
+    from rich.table import Table
+    labels = list(zone_targets) or [workout.zone_model.labels[i] for i in (2, 3, 4)]
+    table = Table(title="Generated sessions ('generate use <#>' to load one)")
+    table.add_column("#", justify="right")
+    table.add_column("Session")
+    table.add_column("Time", justify="right")
+    table.add_column("TSS", justify="right")
+    for label in labels:
+        color = workout._zone_color(label)
+        table.add_column(f"[{color}]{label}[/{color}]", justify="right")
+    for rank, c in enumerate(candidates, 1):
+        zone_times = [c.time_in_zone[workout.zone_model.labels.index(label)] for label in labels]
+        table.add_row(str(rank), c.description, f"{c.seconds // 60}:{c.seconds % 60:02d}",
+                      f"{c.tss:.0f}", *(f"{s // 60}:{s % 60:02d}" for s in zone_times))
+    console.print(table)
+
+
+def read_generate_specs(path):
+    """
+    Batch specs for `generate batch`: CSV rows of name,duration[,tss[,zones]]
+    where zones looks like "Z4=20min Z5=8min". A header row is allowed.
+    """
+    import csv
+    specs = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for lineno, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            if lineno == 1 and row[0].strip().lower() == "name":
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{path}:{lineno}: expected 'name,duration[,tss[,zones]]'")
+            seconds = parse_duration_to_seconds(row[1])
+            if seconds <= 0:
+                raise ValueError(f"{path}:{lineno}: invalid duration '{row[1]}'")
+            tss = float(row[2]) if len(row) > 2 and row[2].strip() else None
+            zone_targets = {}
+            for item in (row[3].split() if len(row) > 3 else ()):
+                zone, _, duration = item.partition("=")
+                zone_targets[zone.upper()] = parse_duration_to_seconds(duration)
+            specs.append((row[0].strip(), seconds, tss, zone_targets))
+    return specs
+
+
+def display_analysis(result):
+    """Compliance summary and per-block table for one analyzed ride"""
+    from rich.table import Table
+    sec = result["seconds"]
+    console.print(
+        f"[bold]Ride:[/] {sec // 60}:{sec % 60:02d} of {result['planned_seconds'] // 60}:"
+        f"{result['planned_seconds'] % 60:02d} planned    "
+        f"[bold]Avg:[/] {result['avg_power']:.0f}W    [bold]NP:[/] {result['np']:.0f}W    "
+        f"[bold]IF:[/] {result['if']:.2f}    [bold]TSS:[/] {result['tss']:.1f}"
+    )
+    console.print(
+        f"[bold]Compliance:[/] {100 * result['compliance']:.0f}% on target    "
+        f"[bold]Above:[/] {result['above'] // 60}:{result['above'] % 60:02d}    "
+        f"[bold]Below:[/] {result['below'] // 60}:{result['below'] % 60:02d}"
+    )
+    table = Table(title=f"Per block ({os.path.basename(result['path'])})")
+    for col in ("#", "Planned", "Ridden", "Target", "Actual", "On target", "Above", "Below"):
+        table.add_column(col, justify="right")
+    for i, (planned, ridden, target, actual, within, above, below) in enumerate(result["blocks"]):
+        pct = 100 * within / planned if planned else 0.0
+        color = "green" if pct >= 80 else "yellow" if pct >= 50 else "red"
+        table.add_row(str(i), f"{planned // 60}:{planned % 60:02d}", f"{ridden // 60}:{ridden % 60:02d}",
+                      f"{target:.0f}W", f"{actual:.0f}W", f"[{color}]{pct:.0f}%[/{color}]",
+                      f"{above}s", f"{below}s")
+    console.print(table)
+
+
+def display_library(rows):
+    """Print catalog rows returned by library.find"""
+    if not rows:
+        console.print("[yellow]No matching workouts.[/]")
+        return
+    import library
+    from rich.table import Table
+    table = Table(title=f"Library ({len(rows)} matches)")
+    table.add_column("Name")
+    table.add_column("Time")
+    table.add_column("IF")
+    table.add_column("TSS")
+    table.add_column("Blocks")
+    table.add_column("Main zone")
+    table.add_column("File")
+    for row in rows:
+        sec = row["seconds"]
+        zone_secs = [row[c] for c in library.ZONE_COLUMNS]
+        main_zone = max(range(len(zone_secs)), key=zone_secs.__getitem__)
+        zone = zones.DEFAULT_MODEL.labels[main_zone]  # the catalog uses the default model
+        color = zones.DEFAULT_MODEL.color(zone)
+        try:
+            path = os.path.relpath(row["path"])
+        except ValueError:  # on another drive than the cwd (Windows)
+            path = os.path.abspath(row["path"])
+        table.add_row(row["name"], f"{sec//60}:{str(sec%60).zfill(2)}",
+                      f"{row['intensity']:.2f}", f"{row['tss']:.0f}", str(row["blocks"]),
+                      f"[{color}]{zone}[/{color}] {100 * zone_secs[main_zone] / (sec or 1):.0f}%",
+                      path)
+    console.print(table)
+
+
+def refresh_screen(focus=None):
     """
     Clear terminal & redraw timeline + summary.
+    focus: block index to centre the view window on (e.g. the last edit).
     """
+    global view_start
+    if not interactive:
+        return
+    if focus is not None:
+        view_start = max(0, focus - view_size // 2)
     console.clear()
     display_timeline()
 
@@ -147,36 +473,6 @@ def parse_duration_to_seconds(duration_str):
         console.print(f"[red]Invalid duration format: '{duration_str}'. Using 0 seconds.[/]")
         return 0
 
-def update_auto_powers(ftp_changed=False):
-    """Update auto powers"""
-    if not workout.ftp:
-        return
-    if not ftp_changed:
-        return
-        
-    for b in workout.blocks:
-        try:
-            if b.get("type") != "steady":
-                continue
-
-            zone = b.get("zone", "")
-            mode = b.get("power_mode", "custom")
-
-            # Keep zone-synced blocks in sync with FTP
-            if mode == "zone" and zone in ["Z1","Z2","Z3","Z4","Z5","Z6"]:
-                new_power = workout._zone_to_power(zone)
-                if new_power is not None:
-                    b["power"] = new_power
-
-            # For custom blocks, if zone is AUTO and we have FTP, set the label once
-            if mode == "custom" and zone == "AUTO":
-                power = b.get("power", 0)
-                b["zone"] = workout._power_to_zone(power)
-
-        except Exception as e:
-            console.print(f"[red]Error updating power for block: {e}[/]")
-
-
 def validate_index(index_str, max_index):
     """Validate block index"""
     try:
@@ -203,6 +499,53 @@ def validate_positive_int(value_str, name):
         return None
 
 
+def show_export_notices():
+    """Print finished background exports and record their files"""
+    for ok, label, result, seconds in exports.notices():
+        if ok:
+            exported.extend(result)
+            console.print(f"💾 Exported {label} in {seconds:.2f}s")
+        else:
+            console.print(f"[red]Export of {label} failed: {result}[/]")
+
+
+def _export_job(snap, filepaths, name, ftp=None, optimize=False):
+    """
+    Background export of a workout snapshot to one or more files (format
+    from each extension), optionally at another FTP. The snapshot is
+    compiled once and shared by every format.
+    """
+    target = snap.optimized() if optimize else snap
+    for filepath in filepaths:
+        target.export(filepath, name=name, ftp=ftp)
+    return list(filepaths)
+
+
+def _export_roster_job(snap, roster, out_dir, name, optimize=False):
+    target = snap.optimized() if optimize else snap
+    return export_roster(target, roster, out_dir, name=name)
+
+
+def dispatch(cmd):
+    """execute() timed as "cmd <name>" while instrumentation is on"""
+    if not instrument.enabled:
+        return execute(cmd)
+    with instrument.measure("cmd " + cmd.split(None, 1)[0].lower()):
+        return execute(cmd)
+
+
+def parse_range(text, parse=float):
+    """Parse 'lo-hi', 'lo-' or '-hi' into (lo, hi) with parse() applied; None on error"""
+    low, sep, high = text.partition("-")
+    if not sep:
+        low = high = text
+    try:
+        return (parse(low) if low else None, parse(high) if high else None)
+    except ValueError:
+        console.print(f"[red]Invalid range: '{text}'. Use lo-hi, lo- or -hi.[/]")
+        return None
+
+
 def validate_power(power_str):
     """Validate power input"""
     try:
@@ -218,36 +561,33 @@ def validate_power(power_str):
         return None
 
 
-def repl():
-    console.print("[bold blue]Zwerminal CLI 🌀 v0.1.0[/]")
-    console.print("Type 'help' to see available commands.\n")
-
-    while True:
-        try:
-            cmd = input("\n> ").strip()
-        except (KeyboardInterrupt, EOFError):
-            break
-
-        if not cmd:
-            continue
-
-        parts = cmd.split()
-        command = parts[0].lower()
-        args = parts[1:]
+def execute(cmd):
+    """
+    Run a single command line against the current workout.
+    Returns False when the command asks to quit.
+    """
+    global workout, view_start, view_size, autosave
+    parts = cmd.split()
+    command = parts[0].lower()
+    args = parts[1:]
 
-        try:
-            if command == "exit":
-                break
+    try:
+        if command == "exit":
+            return False
 
-            elif command == "help":
-                console.print("""
+        elif command == "help":
+            console.print("""
 [bold cyan]Available Commands:[/]
   ftp <value>
       Set your FTP in watts. All subsequent blocks use this FTP.
   
+  zones [6zone|7zone]
+      List the zone models or pick the one used for zone blocks, zone
+      colors and time in zone (default 6zone: Z1–Z6).
+
   add Zx <duration>
-      Add a steady block in zone Zx (Z1–Z6) for given duration 
-      (e.g. 5min, 90s, 1:30). Power is calculated from FTP.
+      Add a steady block in zone Zx (Z1–Z6, or Z1–Z7 with 7zone) for given duration 
+      (e.g. 5min, 90s, 1:30). Power follows FTP, even if FTP changes later.
 
   add <duration> <power>
       Add a steady block at the given power (watts). Zone is 
@@ -267,8 +607,10 @@ def repl():
       Copy blocks in the given index range [start_idx..end_idx] 
       into the clipboard.
 
-  paste
-      Paste the clipboard blocks to the end of the workout.
+  paste [x<n>]
+      Paste the clipboard blocks to the end of the workout. With x<n>
+      (e.g. paste x8) they are added once as a repeat segment played
+      n times; segments can be copied and repeated again.
 
   edit <idx> [-zone Zx] [-time <duration>] [-power <watts>]
       Edit block at index. Cannot edit zone and power at the same time.
@@ -276,11 +618,108 @@ def repl():
   delete <idx>
       Remove the block at the given index.
 
-  preview
-      Display the current workout timeline.
+  undo [n] / redo [n]
+      Undo or redo the last n changes (add, edit, delete, paste, ftp,
+      optimize).
+
+  load <filename.zwo>
+      Replace the current workout with blocks read from a .zwo file
+      (looks in workouts/ too). Uses the current FTP for watts.
+
+  preview [<start_idx> <end_idx>]
+      Display the current workout timeline. Long workouts show a window
+      of blocks around the last edit; give a range to pick the window.
+
+  next / prev
+      Page the timeline window forward / back.
+
+  metrics
+      Show Normalized Power, IF, TSS, time in zone and peak powers
+      computed second by second.
+
+  optimize
+      Shrink the workout without changing what is ridden: merge equal
+      neighbouring blocks, join ramps on the same line and fold repeated
+      on/off pairs into intervals. Reports the ZWO elements saved (undoable).
 
   export <filename.zwo>
       Save to workouts/<filename>.zwo (prompts for workout name).
+      Exports run in the background on a snapshot of the workout, so you
+      can keep editing; a notice is shown when each one finishes.
+
+  export <filename.zwo> -roster <roster.csv>
+      Save one copy per athlete in a `name,ftp` CSV roster to
+      workouts/<filename>/<athlete>.zwo, scaled to each athlete's FTP.
+
+  plan add <YYYY-MM-DD> <file.zwo|tss> [-athletes <a>,<b>]
+      Schedule an exported workout (or a planned TSS, for what-ifs) on a
+      date, for every athlete in the plan or the listed ones.
+
+  plan remove <YYYY-MM-DD> [file.zwo] [-athletes <a>,<b>]
+      Unschedule that day's workouts (only file.zwo if given).
+
+  plan athletes <roster.csv>
+      Add the athletes of a `name,ftp` roster to the plan.
+
+  plan [show [athlete]]
+      Training load across the plan: CTL (fitness, 42-day), ATL (fatigue,
+      7-day) and TSB (form) per athlete, or one athlete week by week.
+      The plan is kept in plan.json.
+
+  generate <duration> [-tss <n>] [-zone <Zx> <duration>]... [-n <count>] [-sets <n>]
+      Build sessions that hit a target, e.g. generate 75min -tss 85 -zone Z4 20min.
+      Searches warmup + up to -sets work sets (steady, intervals, ramps)
+      + endurance + cooldown and lists the best -n (default 5).
+
+  generate use <#>
+      Replace the workout with a generated session (undoable).
+
+  generate batch <specs.csv>
+      Generate the best session for each `name,duration,tss,zones` row
+      (zones like "Z4=20min Z5=8min") and save them as workouts/<name>.zwo.
+
+  analyze <ride.csv> [-tol <percent>]
+      Score a recorded per-second power log (CSV with a power/watts
+      column) against the current workout: NP, TSS and, per block, the
+      time within ±tol% (default 10) of target, above and below it.
+
+  analyze <dir> [-tol <percent>]
+      Score every *.csv ride in a directory (in parallel) and rank them.
+
+  library [<dir>]
+      Catalog the .zwo files under <dir> (default workouts/) into
+      library.db. Only new or changed files are read again.
+
+  find [-time <lo-hi>] [-tss <lo-hi>] [-if <lo-hi>] [-name <text>]
+      Search the library catalog, e.g. find -time 60min-75min -tss 70-90.
+      Either end of a range can be left open (-tss 80-).
+
+  export <filename.zwo> -optimize
+      Run the optimize pass on the exported file only; the workout
+      itself is left unchanged. Combines with -roster and -ftp.
+
+  export <filename.zwo> -ftp <ftp>[,<ftp>...]
+      Save one copy per FTP to workouts/<filename>_<ftp>w.zwo.
+
+  export <filename> -format zwo,erg,mrc,csv
+      Save in several formats at once: Zwift .zwo, .erg (watts) and .mrc
+      (% FTP) for TrainerRoad-style apps, and a per-second CSV power
+      timeline. A filename ending in .erg/.mrc/.csv picks that format.
+      Roster exports are always .zwo.
+
+  autosave on [<dir>] / autosave off
+      Journal every change to <dir> (default .zwerminal-session/) so the
+      session survives a crash. Starting autosave replaces the session
+      saved in <dir>; use resume to continue it instead.
+
+  resume [<dir>]
+      Restore the autosaved session from <dir> and keep autosaving.
+      Undo history starts fresh.
+
+  stats [on|off|reset]
+      Record per-command wall time, call counts and allocations, and time
+      the main workout operations and rendering; 'stats' shows the table.
+      No overhead while off.
 
   help
       Show this help message.
@@ -289,211 +728,921 @@ def repl():
       Quit the app.
 """)
 
-            elif command == "ftp" and len(args) == 1:
-                ftp_value = validate_positive_int(args[0], "FTP")
-                if ftp_value is None:
-                    continue 
-                workout.ftp = ftp_value
-                update_auto_powers(ftp_changed=True)
-                console.print(f"✅ FTP set to [bold]{workout.ftp}W[/]")
-
-            elif command == "add" and args:
-                sub = args[0].lower()
-
-                # 1) Warmup / Cooldown
-                if sub in ("warmup", "cooldown") and len(args) == 4:
-                    p0 = validate_power(args[1])
-                    p1 = validate_power(args[2])
-                    if p0 is None or p1 is None:
-                        continue
-                    dur = parse_duration_to_seconds(args[3])
-                    if dur == 0:
+        elif command == "ftp" and len(args) == 1:
+            ftp_value = validate_positive_int(args[0], "FTP")
+            if ftp_value is None:
+                return True
+            workout.set_ftp(ftp_value)
+            console.print(f"✅ FTP set to [bold]{workout.ftp}W[/]")
+
+        elif command == "zones" and len(args) <= 1:
+            if args:
+                workout.set_zone_model(zones.get_model(args[0]))
+                console.print(f"✅ Zone model set to [bold]{workout.zone_model.title}[/]")
+            hr_models = [m for m in zones.MODELS.values() if m.basis == "hr"]
+            for model in zones.MODELS.values():
+                if model.basis != "hr":
+                    marker = "*" if model is workout.zone_model else " "
+                    bounds = " / ".join(f"{b * 100:.0f}" for b in model.bounds)
+                    console.print(f" {marker} [bold]{model.name:<6}[/] {model.title}: "
+                                  f"zone tops {bounds} % of FTP")
+            if hr_models:
+                # Reference only: workouts are built in power, so these can't be selected
+                console.print("\n[bold]Heart rate models[/] (for reference, not selectable):")
+                for model in hr_models:
+                    bounds = " / ".join(f"{b * 100:.0f}" for b in model.bounds)
+                    console.print(f"   [bold]{model.name:<6}[/] {model.title}: "
+                                  f"zone tops {bounds} % of threshold HR")
+
+        elif command == "add" and args:
+            sub = args[0].lower()
+
+            # 1) Warmup / Cooldown
+            if sub in ("warmup", "cooldown") and len(args) == 4:
+                p0 = validate_power(args[1])
+                p1 = validate_power(args[2])
+                if p0 is None or p1 is None:
+                    return True
+                dur = parse_duration_to_seconds(args[3])
+                if dur == 0:
+                    console.print("[red]Duration must be greater than 0[/]")
+                    return True
+                if p0 >= p1 and sub == "warmup":
+                    console.print("[red]Starting power cannot be greater than or equal to end power[/]")
+                    return True
+                if p0 <= p1 and sub == "cooldown":
+                    console.print("[red]Starting power cannot be less than or equal to end power[/]")
+                    return True
+                workout.add_block(sub, power_start=p0, power_end=p1, duration=dur)
+                refresh_screen(len(workout.blocks) - 1)
+
+            # 2) Interval: add interval p1 t1 p2 t2 reps
+            elif sub == "interval" and len(args) == 6:
+                p1 = validate_power(args[1])
+                p2 = validate_power(args[3])
+                reps = validate_positive_int(args[5], "reps")
+                if p1 is None or p2 is None or reps is None:
+                    return True
+                t1 = parse_duration_to_seconds(args[2])
+                t2 = parse_duration_to_seconds(args[4])
+                if t1 == 0 or t2 == 0:
+                    console.print("[red]Interval durations must be greater than 0[/]")
+                    return True
+                workout.add_block("interval",
+                                  power1=p1, dur1=t1,
+                                  power2=p2, dur2=t2,
+                                  reps=reps)
+                refresh_screen(len(workout.blocks) - 1)
+
+            # 3) `add Zx time` or `add time power`
+            elif len(args) == 2:
+                if args[0].upper().startswith("Z"):
+                    zone, duration_raw = args
+                    if zone.upper() not in workout.zone_model.labels:
+                        console.print(f"[red]Invalid zone. Use {', '.join(workout.zone_model.labels)}.[/]")
+                        return True
+                    duration_s = parse_duration_to_seconds(duration_raw)
+                    if duration_s == 0:
                         console.print("[red]Duration must be greater than 0[/]")
-                        continue
-                    if p0 >= p1 and sub == "warmup":
-                        console.print("[red]Starting power cannot be greater than or equal to end power[/]")
-                        continue
-                    if p0 <= p1 and sub == "cooldown":
-                        console.print("[red]Starting power cannot be less than or equal to end power[/]")
-                        continue
-                    workout.add_block(sub, power_start=p0, power_end=p1, duration=dur)
-                    refresh_screen()
-
-                # 2) Interval: add interval p1 t1 p2 t2 reps
-                elif sub == "interval" and len(args) == 6:
-                    p1 = validate_power(args[1])
-                    p2 = validate_power(args[3])
-                    reps = validate_positive_int(args[5], "reps")
-                    if p1 is None or p2 is None or reps is None:
-                        continue
-                    t1 = parse_duration_to_seconds(args[2])
-                    t2 = parse_duration_to_seconds(args[4])
-                    if t1 == 0 or t2 == 0:
-                        console.print("[red]Interval durations must be greater than 0[/]")
-                        continue
-                    workout.add_block("interval",
-                                      power1=p1, dur1=t1,
-                                      power2=p2, dur2=t2,
-                                      reps=reps)
-                    refresh_screen()
-
-                # 3) `add Zx time` or `add time power`
-                elif len(args) == 2:
-                    if args[0].upper().startswith("Z"):
-                        zone, duration_raw = args
-                        if zone.upper() not in ["Z1", "Z2", "Z3", "Z4", "Z5", "Z6"]:
-                            console.print("[red]Invalid zone. Use Z1-Z6.[/]")
-                            continue
-                        duration_s = parse_duration_to_seconds(duration_raw)
-                        if duration_s == 0:
-                            console.print("[red]Duration must be greater than 0[/]")
-                            continue
-                        duration = f"{duration_s}s"
-                        if workout.ftp is not None:
-                            power = workout._zone_to_power(zone)
-                            if power is not None:
-                                workout.add_block("steady", zone=zone.upper(), duration=duration, power=power, power_mode="zone")
-                                refresh_screen()
-                            else:
-                                console.print("[red]Could not calculate power for zone.[/]")
-                        else:
-                            console.print("[red]Set FTP first using 'ftp [value]'[/]")
-                    else:
-                        # Assume power, duration format
-                        power = validate_power(args[0])
-                        if power is None:
-                            continue
-                        duration_s = parse_duration_to_seconds(args[1])
-                        if duration_s == 0:
-                            console.print("[red]Duration must be greater than 0[/]")
-                            continue
-                        duration = f"{duration_s}s"
-                        workout.add_block("steady", zone="AUTO", duration=duration, power=power)
-                        update_auto_powers()
-                        refresh_screen()
+                        return True
+                    duration = duration_s
+                    workout.add_block("steady", zone=zone.upper(), duration=duration, power_mode="zone")
+                    refresh_screen(len(workout.blocks) - 1)
                 else:
-                    console.print("[red]Invalid 'add' usage. See 'help'.[/]")
+                    # Assume power, duration format
+                    power = validate_power(args[0])
+                    if power is None:
+                        return True
+                    duration_s = parse_duration_to_seconds(args[1])
+                    if duration_s == 0:
+                        console.print("[red]Duration must be greater than 0[/]")
+                        return True
+                    duration = duration_s
+                    workout.add_block("steady", zone="AUTO", duration=duration, power=power)
+                    refresh_screen(len(workout.blocks) - 1)
+            else:
+                console.print("[red]Invalid 'add' usage. See 'help'.[/]")
 
-            elif command == "copy" and len(args) == 2:
-                if not workout.blocks:
-                    console.print("[red]No blocks to copy[/]")
-                    continue
-                i0 = validate_index(args[0], len(workout.blocks))
-                i1 = validate_index(args[1], len(workout.blocks))
-                if i0 is None or i1 is None:
-                    continue
-                if i0 > i1:
-                    console.print("[red]Start index must be <= end index[/]")
-                    continue
-                workout.clipboard = workout.blocks[i0:i1+1].copy()
-                console.print(f"✅ Copied blocks {i0}–{i1}")
+        elif command == "copy" and len(args) == 2:
+            if not workout.blocks:
+                console.print("[red]No blocks to copy[/]")
+                return True
+            i0 = validate_index(args[0], len(workout.blocks))
+            i1 = validate_index(args[1], len(workout.blocks))
+            if i0 is None or i1 is None:
+                return True
+            if i0 > i1:
+                console.print("[red]Start index must be <= end index[/]")
+                return True
+            workout.clipboard = workout.blocks[i0:i1+1].copy()
+            console.print(f"✅ Copied blocks {i0}–{i1}")
 
-            elif command == "paste":
-                if not workout.clipboard:
-                    console.print("[red]Nothing to paste. Use copy first.[/]")
-                    continue
-                workout.blocks.extend([block.copy() for block in workout.clipboard])
-                refresh_screen()
+        elif command == "paste" and len(args) <= 1:
+            if not workout.clipboard:
+                console.print("[red]Nothing to paste. Use copy first.[/]")
+                return True
+            if args:
+                count = validate_positive_int(args[0].lower().lstrip("x"), "repeat count")
+                if count is None:
+                    return True
+                # one shared repeat segment instead of count copies
+                workout.add_block("repeat", blocks=workout.clipboard, count=count)
+            else:
+                workout.extend_blocks(workout.clipboard)
+            refresh_screen(len(workout.blocks) - 1)
 
-            elif command == "edit" and len(args) >= 1:
-                if not workout.blocks:
-                    console.print("[red]No blocks to edit[/]")
-                    continue
-                index = validate_index(args[0], len(workout.blocks))
-                if index is None:
-                    continue
-                    
-                flags = args[1:]
-                kwargs = {}
+        elif command == "edit" and len(args) >= 1:
+            if not workout.blocks:
+                console.print("[red]No blocks to edit[/]")
+                return True
+            index = validate_index(args[0], len(workout.blocks))
+            if index is None:
+                return True
                 
-                if "-zone" in flags and "-power" in flags:
-                    console.print("[red]❌ Cannot specify both -zone and -power. Choose one.[/]")
-                    continue
+            flags = args[1:]
+            kwargs = {}
+            
+            if "-zone" in flags and "-power" in flags:
+                console.print("[red]❌ Cannot specify both -zone and -power. Choose one.[/]")
+                return True
+                
+            if "-zone" in flags:
+                z_idx = flags.index("-zone")
+                if z_idx + 1 < len(flags):
+                    zone = flags[z_idx + 1].upper()
+                    if zone not in workout.zone_model.labels:
+                        console.print(f"[red]Invalid zone. Use {', '.join(workout.zone_model.labels)}.[/]")
+                        return True
+                    kwargs["zone"] = zone
                     
-                if "-zone" in flags:
-                    z_idx = flags.index("-zone")
-                    if z_idx + 1 < len(flags):
-                        zone = flags[z_idx + 1].upper()
-                        if zone not in ["Z1", "Z2", "Z3", "Z4", "Z5", "Z6"]:
-                            console.print("[red]Invalid zone. Use Z1-Z6.[/]")
-                            continue
-                        kwargs["zone"] = zone
-                        
-                if "-time" in flags:
-                    t_idx = flags.index("-time")
-                    if t_idx + 1 < len(flags):
-                        duration_s = parse_duration_to_seconds(flags[t_idx + 1])
-                        if duration_s == 0:
-                            console.print("[red]Duration must be greater than 0[/]")
-                            continue
-                        kwargs["duration"] = f"{duration_s}s"
-                        
-                if "-power" in flags:
-                    p_idx = flags.index("-power")
-                    if p_idx + 1 < len(flags):
-                        power = validate_power(flags[p_idx + 1])
-                        if power is None:
-                            continue
-                        kwargs["power"] = power
-
-                if not kwargs:
-                    console.print("[red]No valid edit parameters provided[/]")
-                    continue
+            if "-time" in flags:
+                t_idx = flags.index("-time")
+                if t_idx + 1 < len(flags):
+                    duration_s = parse_duration_to_seconds(flags[t_idx + 1])
+                    if duration_s == 0:
+                        console.print("[red]Duration must be greater than 0[/]")
+                        return True
+                    kwargs["duration"] = duration_s
                     
-                workout.edit_block(index, **kwargs)
+            if "-power" in flags:
+                p_idx = flags.index("-power")
+                if p_idx + 1 < len(flags):
+                    power = validate_power(flags[p_idx + 1])
+                    if power is None:
+                        return True
+                    kwargs["power"] = power
 
-                if "zone" in kwargs:
-                    update_auto_powers()
-                elif "power" in kwargs and workout.ftp is not None:
-                    workout.blocks[index]["zone"] = workout._power_to_zone(workout.blocks[index]["power"])
+            if not kwargs:
+                console.print("[red]No valid edit parameters provided[/]")
+                return True
+                
+            workout.edit_block(index, **kwargs)
+            refresh_screen(index)
 
-                refresh_screen()
+        elif command == "delete" and len(args) == 1:
+            if not workout.blocks:
+                console.print("[red]No blocks to delete[/]")
+                return True
+            index = validate_index(args[0], len(workout.blocks))
+            if index is None:
+                return True
+            workout.delete_block(index)
+            console.print(f"✅ Deleted block {index}")
+            refresh_screen(index)
 
-            elif command == "delete" and len(args) == 1:
-                if not workout.blocks:
-                    console.print("[red]No blocks to delete[/]")
-                    continue
-                index = validate_index(args[0], len(workout.blocks))
-                if index is None:
-                    continue
-                workout.delete_block(index)
-                console.print(f"✅ Deleted block {index}")
-                refresh_screen()
+        elif command == "load" and len(args) == 1:
+            if workout.ftp is None:
+                console.print("[red]Set FTP first using 'ftp [value]'[/]")
+                return True
+            path = args[0]
+            if not path.endswith('.zwo'):
+                path += '.zwo'
+            if not os.path.exists(path) and os.path.exists(os.path.join(export_dir, path)):
+                path = os.path.join(export_dir, path)
+            try:
+                loaded = Workout.from_zwo(path, workout.ftp, workout.zone_model)
+            except (OSError, ValueError) as e:
+                console.print(f"[red]Load failed: {e}[/]")
+                return True
+            loaded.clipboard = workout.clipboard
+            workout = loaded
+            if autosave is not None:
+                autosave.attach(workout)
+            refresh_screen(0)
+            console.print(f"📂 Loaded {len(workout.blocks)} blocks from {path}")
+
+        elif command == "plan":
+            import plan
+            action = args[0].lower() if args else "show"
+            rest = args[1:]
+            athletes = None
+            if "-athletes" in rest:
+                a_idx = rest.index("-athletes")
+                if a_idx + 1 >= len(rest):
+                    console.print("[red]Usage: -athletes <name>[,<name>...][/]")
+                    return True
+                athletes = rest[a_idx + 1].split(",")
+                rest = rest[:a_idx] + rest[a_idx + 2:]
+
+            p = get_plan()
+            if action == "show" and len(rest) <= 1:
+                display_plan(rest[0] if rest else None)
+                return True
+            if action == "athletes" and len(rest) == 1:
+                import roster
+                for athlete, ftp in roster.load_roster(rest[0]):
+                    p.athlete(athlete, ftp)
+                p.save(plan_file)
+                console.print(f"👥 {len(p.athletes)} athletes in the plan")
+                return True
+            if action == "add" and len(rest) == 2:
+                date = plan.parse_date(rest[0])
+                try:
+                    tss, path = float(rest[1]), None
+                    label = f"{tss:g} TSS"
+                except ValueError:
+                    path = plan_workout_path(rest[1])
+                    label, tss = plan.workout_tss(path)
+                names = p.schedule(date, label, tss, path, athletes)
+                p.save(plan_file)
+                what = f"{label} ({tss:.0f} TSS)" if path else label
+                console.print(f"📅 {what} on {date} for {', '.join(names)}")
+                return True
+            if action == "remove" and 1 <= len(rest) <= 2:
+                date = plan.parse_date(rest[0])
+                path = plan_workout_path(rest[1]) if len(rest) == 2 else None
+                removed = p.unschedule(date, path, athletes)
+                p.save(plan_file)
+                console.print(f"🗑  Removed {removed} planned workout(s) on {date}")
+                return True
+            console.print("[red]Usage: plan [show [athlete]] | plan add <date> <file.zwo|tss> | "
+                          "plan remove <date> [file.zwo] | plan athletes <roster.csv>[/]")
+
+        elif command == "stats" and len(args) <= 1:
+            action = args[0].lower() if args else "show"
+            if action == "on":
+                stats_on()
+                console.print("⏱  Recording command timings and allocations ('stats' to view)")
+            elif action == "off":
+                instrument.disable()
+                console.print("Stopped recording (recorded stats are kept)")
+            elif action == "reset":
+                instrument.reset()
+                console.print("Stats cleared")
+            elif action == "show":
+                display_stats()
+            else:
+                console.print("[red]Usage: stats [on|off|reset][/]")
+
+        elif command == "autosave" and args and args[0] in ("on", "off") and len(args) <= 2:
+            if autosave is not None:
+                autosave.close()
+                autosave = None
+            if args[0] == "on":
+                autosave = session.Journal(args[1] if len(args) > 1 else session.DEFAULT_DIR)
+                autosave.attach(workout)
+                console.print(f"💾 Autosave on: changes are journaled to {autosave.directory}/")
+            else:
+                console.print("Autosave off")
+
+        elif command == "resume" and len(args) <= 1:
+            directory = args[0] if args else session.DEFAULT_DIR
+            try:
+                resumed, seq = session.resume(directory, workout.zone_model)
+            except (OSError, ValueError) as e:
+                console.print(f"[red]Resume failed: {e}[/]")
+                return True
+            if autosave is not None:
+                autosave.close()
+            resumed.clipboard = workout.clipboard
+            workout = resumed
+            autosave = session.Journal(directory)
+            autosave.attach(workout, seq)
+            refresh_screen(len(workout.blocks) - 1)
+            console.print(f"📂 Resumed {len(workout.blocks)} blocks from {directory}/ (autosave on)")
+
+        elif command in ("undo", "redo"):
+            steps = 1
+            if args:
+                steps = validate_positive_int(args[0], "steps")
+                if steps is None:
+                    return True
+            step = workout.undo if command == "undo" else workout.redo
+            done = 0
+            while done < steps and step() is not None:
+                done += 1
+            if not done:
+                console.print(f"[yellow]Nothing to {command}.[/]")
+                return True
+            refresh_screen()
+            verb = "Undid" if command == "undo" else "Redid"
+            console.print(f"↩️  {verb} {done} change{'s' if done != 1 else ''}")
+
+        elif command == "preview":
+            if len(args) == 2:
+                start = validate_index(args[0], len(workout.blocks))
+                end = validate_index(args[1], len(workout.blocks))
+                if start is None or end is None:
+                    return True
+                if start > end:
+                    console.print("[red]Start index must be <= end index[/]")
+                    return True
+                view_size = end - start + 1
+                view_start = start
+            refresh_screen()
 
-            elif command == "preview":
-                refresh_screen()
+        elif command == "metrics":
+            if not workout.blocks:
+                console.print("[red]No blocks yet. Add some workout blocks first.[/]")
+                return True
+            if workout.ftp is None:
+                console.print("[red]Set FTP first using 'ftp [value]'[/]")
+                return True
+            display_metrics()
 
-            elif command == "export" and len(args) >= 1:
-                if not workout.blocks:
-                    console.print("[red]No blocks to export. Add some workout blocks first.[/]")
+        elif command == "optimize":
+            if not workout.blocks:
+                console.print("[red]No blocks yet. Add some workout blocks first.[/]")
+                return True
+            n_blocks = len(workout.blocks)
+            before, after = workout.optimize()
+            refresh_screen(0)
+            console.print(
+                f"🧹 {n_blocks} → {len(workout.blocks)} blocks, "
+                f"{before} → {after} ZWO elements (saved {before - after})"
+            )
+
+        elif command == "generate" and args:
+            import generator
+            if workout.ftp is None:
+                console.print("[red]Set FTP first using 'ftp [value]'[/]")
+                return True
+            action = args[0].lower()
+
+            if action == "use" and len(args) == 2:
+                try:
+                    chosen = candidates[int(args[1]) - 1]
+                except (ValueError, IndexError):
+                    console.print(f"[red]Pick a session from 1 to {len(candidates)} "
+                                  f"(run 'generate <duration> ...' first)[/]")
+                    return True
+                workout.set_blocks(chosen.blocks)
+                refresh_screen(0)
+                console.print(f"✨ Loaded: {chosen.description} ('undo' to go back)")
+                return True
+
+            if action == "batch" and len(args) == 2:
+                specs = read_generate_specs(args[1])
+                start = time.perf_counter()
+                results = generator.generate_batch(specs, workout.ftp, workout.zone_model)
+                os.makedirs(export_dir, exist_ok=True)
+                written = 0
+                for name, best, error in results:
+                    if best is None:
+                        console.print(f"[red]{name}: {error or 'no session found'}[/]")
+                        continue
+                    built = Workout()
+                    built.ftp = workout.ftp
+                    built.set_blocks(best.blocks)
+                    filepath = os.path.join(export_dir, f"{name}.zwo")
+                    built.export(filepath, name=name)
+                    exported.append(filepath)
+                    written += 1
+                console.print(f"✨ Generated {written}/{len(specs)} sessions into {export_dir}/ "
+                              f"in {time.perf_counter() - start:.2f}s")
+                return True
+
+            seconds = parse_duration_to_seconds(args[0])
+            if seconds <= 0:
+                console.print("[red]Usage: generate <duration> [-tss <n>] [-zone <Zx> <duration>]... "
+                              "[-n <count>] [-sets <n>][/]")
+                return True
+            target_tss = None
+            zone_targets = {}
+            count, max_sets = 5, 2
+            flags = args[1:]
+            i = 0
+            while i < len(flags):
+                flag = flags[i].lower()
+                if flag == "-zone" and i + 2 < len(flags):
+                    zone = flags[i + 1].upper()
+                    if zone not in workout.zone_model.labels:
+                        console.print(f"[red]Invalid zone. Use {', '.join(workout.zone_model.labels)}.[/]")
+                        return True
+                    zone_targets[zone] = parse_duration_to_seconds(flags[i + 2])
+                    i += 3
                     continue
-                if workout.ftp is None:
-                    console.print("[red]Set FTP first before exporting.[/]")
+                if flag in ("-tss", "-n", "-sets") and i + 1 < len(flags):
+                    value = float(flags[i + 1])
+                    if flag == "-tss":
+                        target_tss = value
+                    elif flag == "-n":
+                        count = max(1, int(value))
+                    else:
+                        max_sets = max(0, int(value))
+                    i += 2
                     continue
-                    
-                filename = args[0]
-                if not filename.endswith('.zwo'):
-                    filename += '.zwo'
-                    
-                try:
-                    os.makedirs("workouts", exist_ok=True)
-                    default_name = os.path.splitext(filename)[0]
+                console.print(f"[red]Unknown or incomplete option: {flags[i]}[/]")
+                return True
+
+            start = time.perf_counter()
+            candidates[:] = generator.generate(seconds, workout.ftp, target_tss, zone_targets,
+                                               workout.zone_model, count, max_sets)
+            display_candidates(zone_targets)
+            console.print(f"Searched in {time.perf_counter() - start:.2f}s")
+
+        elif command == "analyze" and args:
+            if not workout.blocks:
+                console.print("[red]No blocks yet. Load or build the planned workout first.[/]")
+                return True
+            if workout.ftp is None:
+                console.print("[red]Set FTP first using 'ftp [value]'[/]")
+                return True
+            tolerance = None
+            if "-tol" in args:
+                t_idx = args.index("-tol")
+                if t_idx + 1 >= len(args):
+                    console.print("[red]Usage: analyze <ride.csv | dir> [-tol <percent>][/]")
+                    return True
+                tolerance = float(args[t_idx + 1]) / 100
+                args = args[:t_idx] + args[t_idx + 2:]
+            if len(args) != 1:
+                console.print("[red]Usage: analyze <ride.csv | dir> [-tol <percent>][/]")
+                return True
+            import analysis
+            planned = analysis.Target(workout, analysis.TOLERANCE if tolerance is None else tolerance)
+            start = time.perf_counter()
+            if not os.path.isdir(args[0]):
+                display_analysis(analysis.analyze_ride(args[0], planned))
+                return True
+
+            from rich.table import Table
+            results = analysis.analyze_many(analysis.ride_files(args[0]), planned)
+            table = Table(title=f"Rides in {args[0]} (±{100 * planned.tolerance:.0f}% of target)")
+            for col in ("Ride", "Time", "NP", "TSS", "On target", "Above", "Below"):
+                table.add_column(col, justify="left" if col == "Ride" else "right")
+            ok = [r for r in results if "error" not in r]
+            ok.sort(key=lambda r: r["compliance"], reverse=True)
+            for r in ok:
+                sec = r["seconds"]
+                table.add_row(os.path.basename(r["path"]), f"{sec // 60}:{sec % 60:02d}",
+                              f"{r['np']:.0f}W", f"{r['tss']:.0f}", f"{100 * r['compliance']:.0f}%",
+                              f"{r['above'] // 60}:{r['above'] % 60:02d}",
+                              f"{r['below'] // 60}:{r['below'] % 60:02d}")
+            console.print(table)
+            for r in results:
+                if "error" in r:
+                    console.print(f"[red]{r['path']}: {r['error']}[/]")
+            console.print(f"Analyzed {len(results)} rides in {time.perf_counter() - start:.2f}s")
+
+        elif command == "library" and len(args) <= 1:
+            root = args[0] if args else export_dir
+            start = time.perf_counter()
+            import library
+            counts = library.reindex(library_db, root)
+            elapsed = time.perf_counter() - start
+            console.print(
+                f"📚 Indexed {root}: {counts['added']} added, {counts['updated']} updated, "
+                f"{counts['removed']} removed, {counts['unchanged']} unchanged "
+                f"in {elapsed:.2f}s"
+            )
+            if counts["failed"]:
+                console.print(f"[yellow]{counts['failed']} files could not be read.[/]")
+
+        elif command == "find":
+            parsers = {"-time": ("seconds", parse_duration_to_seconds),
+                       "-tss": ("tss", float), "-if": ("intensity", float)}
+            ranges = {}
+            name = None
+            if len(args) % 2:
+                console.print("[red]Usage: find [-time lo-hi] [-tss lo-hi] [-if lo-hi] [-name text][/]")
+                return True
+            for flag, value in zip(args[::2], args[1::2]):
+                if flag == "-name":
+                    name = value
+                elif flag in parsers:
+                    key, parse = parsers[flag]
+                    bounds = parse_range(value, parse)
+                    if bounds is None:
+                        return True
+                    ranges[key] = bounds
+                else:
+                    console.print(f"[red]Unknown find option: {flag}[/]")
+                    return True
+            if not os.path.exists(library_db):
+                console.print("[red]No library yet. Run 'library [dir]' first.[/]")
+                return True
+            start = time.perf_counter()
+            import library
+            rows = library.find(library_db, ranges, name=name)
+            elapsed = time.perf_counter() - start
+            display_library(rows)
+            console.print(f"[dim]Query took {elapsed * 1000:.1f} ms[/]")
+
+        elif command in ("next", "prev"):
+            step = view_size if command == "next" else -view_size
+            view_start = max(0, min(view_start + step, len(workout.blocks) - 1))
+            refresh_screen()
+
+        elif command == "export" and len(args) >= 1:
+            if not workout.blocks:
+                console.print("[red]No blocks to export. Add some workout blocks first.[/]")
+                return True
+            flags = args[1:]
+            optimize = "-optimize" in flags
+            if optimize:
+                flags.remove("-optimize")
+            roster_path = None
+            ftps = None
+            formats = None
+            if "-format" in flags:
+                fmt_idx = flags.index("-format")
+                if fmt_idx + 1 >= len(flags):
+                    console.print(f"[red]Usage: export <filename> -format <{'|'.join(exporters.FORMATS)}>[,...][/]")
+                    return True
+                formats = flags[fmt_idx + 1].lower().split(",")
+                unknown = [f for f in formats if f not in exporters.FORMATS]
+                if unknown:
+                    console.print(f"[red]Unknown format: {', '.join(unknown)}. "
+                                  f"Use {', '.join(exporters.FORMATS)}.[/]")
+                    return True
+            if "-roster" in flags:
+                r_idx = flags.index("-roster")
+                if r_idx + 1 >= len(flags):
+                    console.print("[red]Usage: export <filename> -roster <roster.csv>[/]")
+                    return True
+                roster_path = flags[r_idx + 1]
+            elif "-ftp" in flags:
+                f_idx = flags.index("-ftp")
+                if f_idx + 1 >= len(flags):
+                    console.print("[red]Usage: export <filename> -ftp <ftp>[,<ftp>...][/]")
+                    return True
+                ftps = [validate_positive_int(v, "FTP") for v in flags[f_idx + 1].split(",")]
+                if None in ftps:
+                    return True
+            elif workout.ftp is None:
+                console.print("[red]Set FTP first before exporting.[/]")
+                return True
+                
+            filename = args[0]
+            fmt = exporters.format_for_path(filename, default=None)
+            if fmt is None:
+                fmt = "zwo"
+                filename += '.zwo'
+            formats = formats or [fmt]
+
+            try:
+                os.makedirs(export_dir, exist_ok=True)
+                default_name = os.path.splitext(filename)[0]
+                if interactive:
+                    from rich.prompt import Prompt
                     workout_name = Prompt.ask("🏷  Enter workout name for Zwift", default=default_name)
-                    filepath = f"workouts/{filename}"
-                    workout.export(filepath, name=workout_name)
-                    console.print(f"\n💾 Exported to workouts/{filename} as '{workout_name}'")
-                except Exception as e:
-                    console.print(f"[red]Export failed: {e}[/]")
+                else:
+                    workout_name = default_name
+
+                # Jobs render a snapshot on a background thread, so editing
+                # can go on while they run.
+                snap = workout.snapshot()
+                if roster_path:
+                    roster = load_roster(roster_path)
+                    out_dir = os.path.join(export_dir, default_name)
+                    exports.submit(f"{len(roster)} athlete files to {out_dir}/",
+                                   _export_roster_job, snap, roster, out_dir, workout_name, optimize)
+                else:
+                    for ftp in ftps or [None]:
+                        stem = f"{default_name}_{ftp}w" if ftp else default_name
+                        name = f"{workout_name} ({ftp}W)" if ftp else workout_name
+                        paths = [os.path.join(export_dir, f"{stem}.{f}") for f in formats]
+                        label = ", ".join(paths) if len(paths) > 1 else paths[0]
+                        exports.submit(f"{label} as '{name}'",
+                                       _export_job, snap, paths, name, ftp, optimize)
+            except Exception as e:
+                console.print(f"[red]Export failed: {e}[/]")
+                return True
 
+            if interactive:
+                console.print(f"⏳ Exporting in the background ({exports.pending()} queued)")
             else:
-                console.print("[red]⚠️ Unknown command. Type 'help' for options.[/]")
+                exports.wait()
+                show_export_notices()
 
-        except Exception as e:
-            console.print(f"[red]An error occurred: {e}[/]")
-            console.print("[yellow]Type 'help' for available commands.[/]")
+        else:
+            console.print("[red]⚠️ Unknown command. Type 'help' for options.[/]")
+
+    except Exception as e:
+        console.print(f"[red]An error occurred: {e}[/]")
+        console.print("[yellow]Type 'help' for available commands.[/]")
+
+
+    return True
 
+
+def repl():
+    import readline  # line editing and arrow-key history for input()
+    readline.set_history_length(1000)
+
+    console.print("[bold blue]Zwerminal CLI 🌀 v0.1.0[/]")
+    console.print("Type 'help' to see available commands.\n")
+
+    while True:
+        show_export_notices()
+        try:
+            cmd = input("\n> ").strip()
+        except (KeyboardInterrupt, EOFError):
+            break
+
+        if not cmd:
+            continue
+
+        if not dispatch(cmd):
+            break
+
+    if exports.pending():
+        console.print(f"Waiting for {exports.pending()} export(s) to finish...")
+    exports.shutdown()
+    show_export_notices()
+    if autosave is not None:
+        autosave.close()
     console.print("\n[bold green]Goodbye![/]")
 
 
+def iter_script_commands(lines):
+    """Yield commands from a script, skipping blanks and # comments"""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def run_script(path, out_dir="workouts"):
+    """
+    Run a command script headlessly on a fresh workout ("-" reads stdin).
+    Returns a summary dict; used directly and as the process pool worker.
+    """
+    global workout, interactive, export_dir, autosave
+    workout = Workout()
+    interactive = False
+    export_dir = out_dir
+    exported.clear()
+
+    start = time.perf_counter()
+    n_cmds = 0
+    error = None
+    try:
+        if path == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        for cmd in iter_script_commands(lines):
+            n_cmds += 1
+            if not dispatch(cmd):
+                break
+    except (OSError, UnicodeDecodeError) as e:
+        error = str(e)
+    finally:
+        if autosave is not None:
+            autosave.close()
+            autosave = None
+
+    return {
+        "script": path,
+        "commands": n_cmds,
+        "blocks": len(workout.blocks),
+        "exported": list(exported),
+        "seconds": time.perf_counter() - start,
+        "error": error,
+    }
+
+
+def _run_scripts(paths, out_dir):
+    """run_script() over several scripts (process pool worker)"""
+    return [run_script(p, out_dir) for p in paths]
+
+
+def run_batch(paths, out_dir="workouts", jobs=None):
+    """Run scripts (files, directories of *.zw, or "-") and report throughput"""
+    scripts = []
+    for p in paths:
+        if os.path.isdir(p):
+            scripts.extend(
+                os.path.join(p, name) for name in sorted(os.listdir(p))
+                if name.endswith(".zw")
+            )
+        else:
+            scripts.append(p)
+
+    if not scripts:
+        console.print("[red]No scripts to run[/]")
+        return 1
+
+    start = time.perf_counter()
+    # Each script is a whole run, so two are already worth a pool
+    results = parallel_map(_run_scripts, scripts, out_dir, jobs=jobs, min_items=2)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if r["error"]]
+    for r in failed:
+        console.print(f"[red]{r['script']}: {r['error']}[/]")
+
+    n_files = sum(len(r["exported"]) for r in results)
+    n_blocks = sum(r["blocks"] for r in results)
+    n_cmds = sum(r["commands"] for r in results)
+    rate = len(results) / elapsed if elapsed else 0.0
+    console.print(
+        f"\n[bold]Scripts:[/] {len(results)} ({len(failed)} failed)    "
+        f"[bold]Commands:[/] {n_cmds}    [bold]Blocks:[/] {n_blocks}    "
+        f"[bold]Exported:[/] {n_files}"
+    )
+    console.print(
+        f"[bold]Elapsed:[/] {elapsed:.2f}s    "
+        f"[bold]Throughput:[/] {rate:.1f} scripts/s, "
+        f"{(n_files / elapsed if elapsed else 0.0):.1f} files/s"
+    )
+    return 1 if failed else 0
+
+
+# Commands (or command + subcommand) a watched spec doesn't run: watch
+# writes the output itself and these would write other files on every save
+WATCH_SKIP = ("export", "autosave", "resume", "plan", "library", "generate batch")
+
+
+def watch_commands(lines):
+    """(commands to run, commands skipped) of a watched spec; stops at `exit`"""
+    commands, skipped = [], 0
+    for cmd in iter_script_commands(lines):
+        words = cmd.lower().split(None, 2)
+        if words[0] == "exit":
+            break
+        if words[0] in WATCH_SKIP or " ".join(words[:2]) in WATCH_SKIP:
+            skipped += 1
+        else:
+            commands.append(cmd)
+    return commands, skipped
+
+
+def _checkpoint():
+    """State a watched spec can be rewound to, taken before each command"""
+    return workout, workout.history_depth(), workout.clipboard, workout.zone_model, tuple(candidates)
+
+
+def _rewind(point, undone):
+    """
+    Restore a _checkpoint() by undoing the commands run since. Returns
+    False when it can't, e.g. because one of those commands was itself an
+    undo or redo, and the spec has to be re-run from the top.
+    """
+    global workout
+    target, depth, clipboard, model, found = point
+    if any(cmd.split(None, 1)[0].lower() in ("undo", "redo") for cmd in undone):
+        return False
+    if not target.rewind(depth):
+        return False
+    target.clipboard = clipboard
+    if target.zone_model is not model:
+        target.set_zone_model(model)
+    candidates[:] = found
+    workout = target
+    return True
+
+
+def watch_spec(spec, out, name=None, interval=None):
+    """
+    Rebuild out from the command script spec whenever it changes. Only the
+    commands from the first one that changed are re-run (the workout is
+    rewound to just before it through its undo history), and out is only
+    rewritten when its content hash changes.
+    """
+    global workout, interactive
+    import watch
+    from fsutil import atomic_write
+    interactive = False
+    workout = Workout()
+    fmt = exporters.format_for_path(out)
+    name = name or os.path.splitext(os.path.basename(out))[0]
+    last_hash = watch.file_hash(out)
+    ran, points = [], []  # commands run so far, and the state before each
+
+    console.print(f"👀 Watching {spec} → {out} (Ctrl+C to stop)")
+    try:
+        for lines in watch.changes(spec, interval or watch.INTERVAL):
+            start = time.perf_counter()
+            commands, skipped = watch_commands(lines)
+            first = watch.first_change(ran, commands)
+            if first is None:
+                console.print(f"[dim]{spec}: no command changes[/]")
+                continue
+            if first < len(ran) and not _rewind(points[first], ran[first:]):
+                first = 0
+                workout = Workout()
+                candidates.clear()
+            del ran[first:], points[first:]
+            for cmd in commands[first:]:
+                points.append(_checkpoint())
+                ran.append(cmd)
+                dispatch(cmd)
+
+            rerun = f"Re-ran {len(commands) - first} of {len(commands)} commands"
+            if skipped:
+                rerun += f" (skipped {skipped} {', '.join(WATCH_SKIP)})"
+            if not workout.blocks:
+                console.print(f"[yellow]{rerun}; no blocks yet, {out} not written[/]")
+                continue
+            try:
+                content = "".join(workout.iter_format(fmt, name=name))
+                digest = watch.content_hash(content)
+                if digest != last_hash:
+                    atomic_write(out, lambda f: f.write(content), sync=False, newline="")
+                    last_hash = digest
+                    status = f"wrote {out}"
+                else:
+                    status = f"{out} unchanged"
+            except (OSError, ValueError) as e:
+                console.print(f"[red]{rerun}; {out} not written: {e}[/]")
+                continue
+            ms = (time.perf_counter() - start) * 1000
+            console.print(f"🔁 {rerun}, {status} ({ms:.1f} ms)")
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="zwerminal", description="Zwift workout builder")
+    sub = parser.add_subparsers(dest="mode")
+    run_p = sub.add_parser("run", help="run command scripts without the interactive UI")
+    run_p.add_argument("paths", nargs="*", default=["-"],
+                       help="script files, directories of *.zw scripts, or - for stdin")
+    run_p.add_argument("-o", "--out-dir", default="workouts", help="export directory")
+    run_p.add_argument("-j", "--jobs", type=int, default=None,
+                       help="worker processes for multiple scripts (default: CPU count)")
+    serve_p = sub.add_parser("serve", help="serve workout rendering over local HTTP/JSON")
+    serve_p.add_argument("-p", "--port", type=int, default=8765,
+                         help="port on 127.0.0.1 (default 8765, 0 picks a free port)")
+    serve_p.add_argument("--cache-size", type=int, default=256,
+                         help="rendered workouts kept for repeat requests (default 256)")
+    watch_p = sub.add_parser("watch", help="rebuild a workout file whenever its command script changes")
+    watch_p.add_argument("spec", help="command script to watch")
+    watch_p.add_argument("out", help="file to write (.zwo, .erg, .mrc or .csv)")
+    watch_p.add_argument("-n", "--name", default=None,
+                         help="workout name in the file (default: the output file name)")
+    watch_p.add_argument("-i", "--interval", type=float, default=0.1,
+                         help="seconds between checks of the script (default 0.1)")
+    parser.add_argument("--resume", nargs="?", const=session.DEFAULT_DIR, metavar="DIR",
+                        help="start by resuming the autosaved session in DIR")
+    parser.add_argument("--stats", action="store_true",
+                        default=bool(os.environ.get("ZWERMINAL_STATS")),
+                        help="record command timings from the start (env: ZWERMINAL_STATS=1)")
+    parser.add_argument("--profile", metavar="FILE", default=os.environ.get("ZWERMINAL_PROFILE"),
+                        help="run under cProfile and write pstats to FILE on exit "
+                             "(env: ZWERMINAL_PROFILE)")
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        stats_on()
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.mode == "run":
+            status = run_batch(args.paths, out_dir=args.out_dir, jobs=args.jobs)
+            if args.stats:
+                if (args.jobs or os.cpu_count() or 1) > 1:
+                    # Scripts ran in worker processes, whose timings stay there
+                    console.print("[yellow]--stats only records this process; "
+                                  "rerun with -j 1 for the timings table.[/]")
+                else:
+                    display_stats()
+            return status
+
+        if args.mode == "serve":
+            import server  # deferred: pulls in asyncio
+            server.serve(port=args.port, cache_size=args.cache_size)
+            return 0
+
+        if args.mode == "watch":
+            return watch_spec(args.spec, args.out, name=args.name, interval=args.interval)
+
+        if args.resume:
+            execute(f"resume {args.resume}")
+        repl()
+        return 0
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            console.print(f"Profile written to {args.profile} "
+                          f"(view with: python -m pstats {args.profile})")
+
+
 if __name__ == "__main__":
-    repl()
\ No newline at end of file
+    if getattr(sys, "frozen", False):
+        # PyInstaller builds spawn process pool workers by re-running this
+        # binary; freeze_support() turns those into workers instead of CLIs.
+        # It's a no-op otherwise, so plain runs skip importing multiprocessing.
+        from multiprocessing import freeze_support
+        freeze_support()
+    sys.exit(main())
@@ -0,0 +1,135 @@
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+
+# Windows reported by peak_powers (seconds)
+PEAK_WINDOWS = (5, 60, 300, 1200)
+
+
+def power_stream(blocks, ftp=None) -> array:
+    """
+    Expand blocks into one watts sample per second (ftp resolves blocks
+    stored relative to FTP).
+    Ramps are sampled at each second's midpoint, so a ramp's samples
+    average exactly (start + end) / 2.
+    """
+    out = array("d")
+    for b in blocks:
+        btype = b.type
+        if btype == "steady":
+            out.extend(array("d", [b.avg_watts(ftp)]) * max(0, b.duration))
+        elif btype in ("warmup", "cooldown"):
+            d = b.duration
+            if d > 0:
+                p0 = b.power_start
+                step = (b.power_end - p0) / d
+                out.extend(array("d", [p0 + step * (k + 0.5) for k in range(d)]))
+        elif btype == "repeat":
+            out.extend(power_stream(b.blocks, ftp) * b.count)
+        elif btype == "interval":
+            rep = array("d", [b.power1]) * max(0, b.dur1)
+            rep.extend(array("d", [b.power2]) * max(0, b.dur2))
+            out.extend(rep * max(0, b.reps))
+    return out
+
+
+def _prefix(stream):
+    """Prefix sums with a leading 0, so sum(stream[i:j]) == c[j] - c[i]"""
+    return list(accumulate(stream, initial=0.0))
+
+
+def rolling_mean(stream, window):
+    """Trailing rolling mean over full windows"""
+    if len(stream) < window:
+        return []
+    c = _prefix(stream)
+    return [(hi - lo) / window for hi, lo in zip(c[window:], c)]
+
+
+def normalized_power(stream, window=30) -> float:
+    """Normalized Power: 4th root of the mean 4th power of the 30 s rolling average"""
+    if not stream:
+        return 0.0
+    rolled = rolling_mean(stream, window)
+    if not rolled:
+        return sum(stream) / len(stream)
+    return (sum(p * p * p * p for p in rolled) / len(rolled)) ** 0.25
+
+
+class RollingNP:
+    """
+    Normalized Power over a stream fed in chunks; gives the same result as
+    normalized_power() on the whole stream while holding only the last
+    window - 1 samples between chunks.
+    """
+    __slots__ = ("window", "count", "total", "_tail", "_sum4", "_rolled")
+
+    def __init__(self, window=30):
+        self.window = window
+        self.count = 0       # samples seen
+        self.total = 0.0     # their sum
+        self._tail = array("d")
+        self._sum4 = 0.0     # sum of rolling mean ** 4
+        self._rolled = 0     # full windows seen
+
+    def update(self, chunk):
+        self.count += len(chunk)
+        self.total += sum(chunk)
+        data = self._tail + array("d", chunk)
+        w = self.window
+        if len(data) >= w:
+            c = _prefix(data)
+            self._sum4 += sum(((hi - lo) / w) ** 4 for hi, lo in zip(c[w:], c))
+            self._rolled += len(data) - w + 1
+        self._tail = data[-(w - 1):] if w > 1 else array("d")
+
+    def value(self) -> float:
+        if not self.count:
+            return 0.0
+        if not self._rolled:
+            return self.total / self.count
+        return (self._sum4 / self._rolled) ** 0.25
+
+
+def peak_powers(stream, windows=PEAK_WINDOWS):
+    """Best average power for each window length; None if the stream is shorter"""
+    c = _prefix(stream)
+    peaks = {}
+    for w in windows:
+        if len(stream) < w:
+            peaks[w] = None
+        else:
+            peaks[w] = max(map(float.__sub__, c[w:], c)) / w
+    return peaks
+
+
+def time_in_zones(stream, thresholds):
+    """
+    Seconds spent in each zone given ascending watt thresholds;
+    zone i covers [thresholds[i-1], thresholds[i]).
+    Each distinct value is classified once: workout streams are long runs
+    of the same target and ride data is mostly whole watts, so this is one
+    counting pass over the stream plus a bisect per distinct value.
+    """
+    seconds = [0] * (len(thresholds) + 1)
+    for value, n in Counter(stream).items():
+        seconds[bisect_right(thresholds, value)] += n
+    return seconds
+
+
+def summarize(stream, ftp, zone_model):
+    """NP, IF, TSS, time in zone (per zone_model) and peak powers for a power stream"""
+    sec = len(stream)
+    np_ = normalized_power(stream)
+    if_ = np_ / ftp if ftp else 0.0
+    tss = sec * np_ * if_ / (ftp * 36) if ftp else 0.0  # 36 = 3600 sec / 100
+    return {
+        "seconds": sec,
+        "avg_power": sum(stream) / sec if sec else 0.0,
+        "np": np_,
+        "if": if_,
+        "tss": tss,
+        "time_in_zone": zone_model.time_in_zones(stream, ftp) if ftp else [],
+        "peaks": peak_powers(stream),
+    }
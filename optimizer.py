@@ -0,0 +1,112 @@
+from blocks import RepeatBlock
+
+
+def _intensity(b):
+    """Comparable intensity of a steady block: relative ratio or absolute watts"""
+    return ("ratio", b.ratio) if b.relative else ("watts", b.power)
+
+
+def _merge_steady(a, b):
+    """One steady block for two adjacent equal-intensity steady blocks, else None"""
+    if a.type == "steady" and b.type == "steady" and _intensity(a) == _intensity(b):
+        return a.replace(duration=a.duration + b.duration)
+    return None
+
+
+def _merge_ramp(a, b):
+    """
+    One ramp for two contiguous ramps on the same line (b starts where a
+    ends, with the same slope), else None.
+    """
+    if a.type not in ("warmup", "cooldown") or b.type != a.type:
+        return None
+    if a.power_end != b.power_start or a.duration <= 0 or b.duration <= 0:
+        return None
+    # equal slopes, compared without division
+    if (a.power_end - a.power_start) * b.duration != (b.power_end - b.power_start) * a.duration:
+        return None
+    return a.replace(power_end=b.power_end, duration=a.duration + b.duration)
+
+
+def _merge_interval(a, b):
+    """Two identical interval blocks become one with the reps added"""
+    if a.type == "interval" and b.type == "interval" and a.key()[:-1] == b.key()[:-1]:
+        return a.replace(reps=a.reps + b.reps)
+    return None
+
+
+def _merge_repeat(a, b):
+    """Adjacent repeats of the same segment become one with the counts added"""
+    if a.type == "repeat" and b.type == "repeat" and a.key()[:-1] == b.key()[:-1]:
+        return a.replace(count=a.count + b.count)
+    return None
+
+
+MERGES = (_merge_steady, _merge_ramp, _merge_interval, _merge_repeat)
+
+
+def _merge_adjacent(blocks):
+    out = []
+    for b in blocks:
+        if out:
+            for merge in MERGES:
+                merged = merge(out[-1], b)
+                if merged is not None:
+                    out[-1] = merged
+                    break
+            else:
+                out.append(b)
+        else:
+            out.append(b)
+    return out
+
+
+def _fold_pairs(blocks):
+    """
+    Fold runs of alternating on/off steady pairs (A B A B ...) into a
+    repeat segment of the pair, which exports as one IntervalsT.
+    """
+    out = []
+    i = 0
+    n = len(blocks)
+    while i < n:
+        a = blocks[i]
+        if a.type == "steady" and i + 3 < n and blocks[i + 1].type == "steady":
+            pair = (a.key(), blocks[i + 1].key())
+            reps = 1
+            while (i + 2 * reps + 1 < n and blocks[i + 2 * reps].key() == pair[0]
+                   and blocks[i + 2 * reps + 1].key() == pair[1]):
+                reps += 1
+            if reps >= 2:
+                out.append(RepeatBlock(blocks=(a, blocks[i + 1]), count=reps))
+                i += 2 * reps
+                continue
+        out.append(a)
+        i += 1
+    return out
+
+
+def optimize_blocks(blocks):
+    """
+    Return an equivalent, shorter block list:
+      - adjacent steady blocks at the same intensity are merged
+      - contiguous ramps on the same line are joined into one ramp
+      - identical adjacent intervals / repeats have their counts added
+      - alternating on/off steady pairs fold into a repeat (IntervalsT)
+      - zero-length steady blocks and ramps are dropped
+    Repeat segments are optimized recursively. Input blocks are not modified.
+    """
+    result = []
+    for b in blocks:
+        if b.type in ("steady", "warmup", "cooldown") and b.duration <= 0:
+            continue  # never exported
+        if b.type == "repeat":
+            children = optimize_blocks(b.blocks)
+            if not children:
+                continue
+            if len(children) == 1 and children[0].type == "steady":
+                b = children[0].replace(duration=children[0].duration * b.count)
+            elif children != list(b.blocks):
+                b = b.replace(blocks=children)
+        result.append(b)
+    return _merge_adjacent(_fold_pairs(_merge_adjacent(result)))
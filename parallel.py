@@ -0,0 +1,34 @@
+import os
+import threading
+
+# Fewer items than this run in-process: starting a pool costs more than it saves
+MIN_ITEMS = 16
+
+
+def parallel_map(fn, items, *args, jobs=None, min_items=MIN_ITEMS, chunks_per_job=4, max_chunk=None):
+    """
+    Concatenated results of fn(chunk, *args) over items split into chunks,
+    in order. Runs in this process when jobs is 1 or there are fewer than
+    min_items items, else on jobs worker processes (default: CPU count).
+    Off the main thread (e.g. an ExportQueue job) workers are spawned, not
+    forked: forking copies whatever locks other threads hold at that moment.
+    """
+    items = list(items)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(items) < min_items:
+        return list(fn(items, *args))
+    from concurrent.futures import ProcessPoolExecutor
+
+    size = -(-len(items) // (jobs * chunks_per_job))
+    if max_chunk:
+        size = min(size, max_chunk)
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    mp_context = None
+    if threading.current_thread() is not threading.main_thread():
+        import multiprocessing
+        mp_context = multiprocessing.get_context("spawn")
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as pool:
+        for part in pool.map(fn, chunks, *([a] * len(chunks) for a in args)):
+            results.extend(part)
+    return results
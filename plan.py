@@ -0,0 +1,276 @@
+"""Training plans: workouts scheduled on dates per athlete, with CTL/ATL/TSB training load"""
+import datetime
+import json
+import math
+import os
+from array import array
+from itertools import accumulate
+from operator import mul
+
+from fsutil import atomic_write
+
+PLAN_FILE = "plan.json"
+
+CTL_DAYS = 42
+ATL_DAYS = 7
+
+# Athlete used when a plan has no roster
+DEFAULT_ATHLETE = "me"
+
+
+def parse_date(text) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(str(text))
+    except ValueError:
+        raise ValueError(f"Invalid date '{text}'. Use YYYY-MM-DD.")
+
+
+# Days per closed-form batch in _ewma; keeps a^-(j+1) far from overflow
+EWMA_BATCH = 256
+
+_ewma_weights = {}  # days -> (k * a^-(j+1), a^(j+1)) for j < EWMA_BATCH
+
+
+def _ewma(tss, start, days, initial):
+    """
+    load[t] = load[t-1] + (tss[t] - load[t-1]) * k over tss[start:], with
+    k = 1 - e^(-1/days), as an array that begins with initial. Each batch
+    of days uses the closed form (a = 1 - k, base = load before the batch)
+        load[j] = a^(j+1) * (base + sum(k * a^-(i+1) * tss[i], i <= j))
+    through C-level map/accumulate instead of one Python call per day.
+    """
+    weights = _ewma_weights.get(days)
+    if weights is None:
+        a = math.exp(-1 / days)
+        down = [a ** (j + 1) for j in range(EWMA_BATCH)]
+        weights = _ewma_weights[days] = ([(1 - a) / d for d in down], down)
+    k_up, down = weights
+    out = array("d", (initial,))
+    for s in range(start, len(tss), EWMA_BATCH):
+        sums = accumulate(map(mul, tss[s:s + EWMA_BATCH], k_up), initial=out[-1])
+        next(sums)
+        out.extend(map(mul, down, sums))
+    return out
+
+
+class AthleteLoad:
+    """
+    Daily TSS and the CTL/ATL series for one athlete. Days are offsets
+    from the plan start. Changes mark the first dirty day; the series are
+    rebuilt from there on the next read.
+    """
+    __slots__ = ("name", "ftp", "ctl0", "atl0", "tss", "entries", "_ctl", "_atl", "_dirty")
+
+    def __init__(self, name, ftp=None, ctl0=0.0, atl0=0.0):
+        self.name = name
+        self.ftp = ftp
+        self.ctl0 = float(ctl0)  # loads going into the first day
+        self.atl0 = float(atl0)
+        self.tss = array("d")
+        self.entries = {}  # day -> [(label, path or None, tss)]
+        self._ctl = array("d")
+        self._atl = array("d")
+        self._dirty = 0
+
+    def _grow(self, days):
+        if days > len(self.tss):
+            self.tss.extend(array("d", bytes(8 * (days - len(self.tss)))))
+
+    def shift(self, days):
+        """Move every day later by days (the plan start moved earlier)"""
+        self.tss[0:0] = array("d", bytes(8 * days))
+        self.entries = {d + days: e for d, e in self.entries.items()}
+        self._dirty = 0
+
+    def add(self, day, label, path, tss):
+        self._grow(day + 1)
+        self.entries.setdefault(day, []).append((label, path, tss))
+        self._set_day(day)
+
+    def remove(self, day, path=None) -> int:
+        """Remove the day's workouts (only those from path if given); returns how many"""
+        entries = self.entries.get(day, [])
+        keep = [e for e in entries if path is not None and e[1] != path]
+        removed = len(entries) - len(keep)
+        if removed:
+            if keep:
+                self.entries[day] = keep
+            else:
+                del self.entries[day]
+            self._set_day(day)
+        return removed
+
+    def _set_day(self, day):
+        self.tss[day] = sum(e[2] for e in self.entries.get(day, ()))
+        self._dirty = min(self._dirty, day)
+
+    def loads(self):
+        """(ctl, atl) arrays, one value per day, refreshed from the first changed day"""
+        n = len(self.tss)
+        d = self._dirty
+        if d < n or len(self._ctl) != n:
+            d = min(d, len(self._ctl))
+            ctl0 = self._ctl[d - 1] if d else self.ctl0
+            atl0 = self._atl[d - 1] if d else self.atl0
+            ctl = _ewma(self.tss, d, CTL_DAYS, ctl0)
+            atl = _ewma(self.tss, d, ATL_DAYS, atl0)
+            self._ctl[d:] = ctl[1:]
+            self._atl[d:] = atl[1:]
+            self._dirty = n
+        return self._ctl, self._atl
+
+    def tsb(self, day) -> float:
+        """Form going into day: yesterday's CTL - ATL"""
+        if day <= 0:
+            return self.ctl0 - self.atl0
+        ctl, atl = self.loads()
+        day = min(day, len(ctl))
+        return ctl[day - 1] - atl[day - 1]
+
+
+class Plan:
+    """A calendar of AthleteLoad series sharing one start date"""
+
+    def __init__(self, start=None):
+        self.start = start
+        self.athletes = {}
+
+    def athlete(self, name, ftp=None) -> AthleteLoad:
+        a = self.athletes.get(name)
+        if a is None:
+            a = self.athletes[name] = AthleteLoad(name, ftp)
+        elif ftp:
+            a.ftp = ftp
+        return a
+
+    def day(self, date) -> int:
+        """Day offset of date, moving the plan start earlier if needed"""
+        if self.start is None:
+            self.start = date
+        offset = (date - self.start).days
+        if offset < 0:
+            for a in self.athletes.values():
+                a.shift(-offset)
+            self.start = date
+            offset = 0
+        return offset
+
+    def date(self, day) -> datetime.date:
+        return self.start + datetime.timedelta(days=day)
+
+    def days(self) -> int:
+        return max((len(a.tss) for a in self.athletes.values()), default=0)
+
+    def names(self, athletes=None):
+        """Athletes to act on: the given names, else everyone, else the default athlete"""
+        if athletes:
+            missing = [n for n in athletes if n not in self.athletes]
+            if missing:
+                raise ValueError(f"Unknown athlete(s): {', '.join(missing)}")
+            return list(athletes)
+        return list(self.athletes) or [DEFAULT_ATHLETE]
+
+    def schedule(self, date, label, tss, path=None, athletes=None):
+        """Put a workout (or a planned TSS when path is None) on date"""
+        names = self.names(athletes)
+        day = self.day(date)
+        for name in names:
+            self.athlete(name).add(day, label, path, tss)
+        return names
+
+    def unschedule(self, date, path=None, athletes=None) -> int:
+        if self.start is None:
+            return 0
+        day = (date - self.start).days
+        if day < 0:
+            return 0
+        return sum(self.athletes[n].remove(day, path)
+                   for n in self.names(athletes) if n in self.athletes)
+
+    def _align(self):
+        """Extend every athlete to the last planned day, so loads end on the same date"""
+        n = self.days()
+        for a in self.athletes.values():
+            a._grow(n)
+
+    def weeks(self, name):
+        """(week start, TSS, CTL, ATL, TSB) at the end of each week of the plan"""
+        self._align()
+        a = self.athletes[name]
+        ctl, atl = a.loads()
+        rows = []
+        for first in range(0, len(a.tss), 7):
+            last = min(first + 7, len(a.tss)) - 1
+            rows.append((self.date(first), sum(a.tss[first:last + 1]),
+                         ctl[last], atl[last], a.tsb(last + 1)))
+        return rows
+
+    def summary(self):
+        """(athlete, TSS, peak CTL, end CTL, end ATL, end TSB, lowest TSB) for every athlete"""
+        self._align()
+        rows = []
+        for name, a in self.athletes.items():
+            ctl, atl = a.loads()
+            if not len(ctl):
+                rows.append((name, 0.0, a.ctl0, a.ctl0, a.atl0, a.ctl0 - a.atl0, a.ctl0 - a.atl0))
+                continue
+            low = min(map(float.__sub__, ctl, atl))
+            rows.append((name, sum(a.tss), max(ctl), ctl[-1], atl[-1], ctl[-1] - atl[-1],
+                         min(low, a.ctl0 - a.atl0)))
+        return rows
+
+    # ---- persistence ----
+    def to_dict(self):
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "athletes": {
+                name: {
+                    "ftp": a.ftp, "ctl": a.ctl0, "atl": a.atl0,
+                    "days": {self.date(d).isoformat(): [
+                        {"label": label, "path": path, "tss": tss} for label, path, tss in e]
+                        for d, e in sorted(a.entries.items())},
+                }
+                for name, a in self.athletes.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        plan = cls(parse_date(d["start"]) if d.get("start") else None)
+        for name, ad in d.get("athletes", {}).items():
+            a = plan.athletes[name] = AthleteLoad(name, ad.get("ftp"), ad.get("ctl", 0.0),
+                                                  ad.get("atl", 0.0))
+            for date, entries in ad.get("days", {}).items():
+                day = plan.day(parse_date(date))
+                for e in entries:
+                    a.add(day, e["label"], e.get("path"), float(e["tss"]))
+        return plan
+
+    def save(self, path=PLAN_FILE):
+        """Write the plan as JSON (atomically, via a temp file and os.replace)"""
+        atomic_write(path, lambda f: json.dump(self.to_dict(), f, indent=1))
+
+    @classmethod
+    def load(cls, path=PLAN_FILE):
+        """Plan from path, or an empty plan when the file doesn't exist"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                return cls.from_dict(json.load(f))
+        except FileNotFoundError:
+            return cls()
+
+
+_tss_cache = {}  # path -> (mtime_ns, size, name, tss)
+
+
+def workout_tss(path):
+    """(name, TSS) of a .zwo file, cached until the file changes"""
+    st = os.stat(path)
+    cached = _tss_cache.get(path)
+    if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+        from library import CATALOG_FTP, zwo_name
+        from workout import Workout
+        w = Workout.from_zwo(path, CATALOG_FTP)
+        name = zwo_name(path) or os.path.splitext(os.path.basename(path))[0]
+        cached = _tss_cache[path] = (st.st_mtime_ns, st.st_size, name, w.estimate_tss())
+    return cached[2], cached[3]
@@ -0,0 +1,64 @@
+import csv
+import os
+import re
+
+from parallel import parallel_map
+
+
+def load_roster(path):
+    """
+    Read a roster CSV of `name,ftp` rows.
+    A header row, blank lines and # comments are skipped.
+    """
+    roster = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for lineno, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{path}:{lineno}: expected 'name,ftp'")
+            name, ftp = row[0].strip(), row[1].strip()
+            try:
+                ftp = int(ftp)
+            except ValueError:
+                if not roster and lineno == 1:
+                    continue  # header
+                raise ValueError(f"{path}:{lineno}: invalid FTP '{ftp}'")
+            if ftp <= 0:
+                raise ValueError(f"{path}:{lineno}: FTP must be positive")
+            roster.append((name, ftp))
+    return roster
+
+
+def athlete_filename(athlete):
+    """Filesystem-safe file name for an athlete"""
+    slug = re.sub(r"[^\w.-]+", "_", athlete.strip()).strip("_")
+    return f"{slug or 'athlete'}.zwo"
+
+
+def _export_chunk(chunk, workout, out_dir, name):
+    """Render and write one slice of the roster (process pool worker)"""
+    paths = []
+    ftps = [ftp for _, ftp in chunk]
+    for (athlete, _), ratios in zip(chunk, workout.ratio_rows(ftps)):
+        filepath = os.path.join(out_dir, athlete_filename(athlete))
+        workout.export(filepath, name=f"{name} - {athlete}", ratios=ratios)
+        paths.append(filepath)
+    return paths
+
+
+def export_roster(workout, roster, out_dir, name="Custom Workout", jobs=None):
+    """
+    Export one .zwo per (athlete, ftp) in roster to out_dir.
+    Zone-synced blocks follow each athlete's FTP; custom blocks keep their
+    watts. Large rosters are split across a process pool.
+    Returns the list of written paths.
+    """
+    if not workout.blocks:
+        raise ValueError("Cannot export empty workout")
+    if not roster:
+        raise ValueError("Roster is empty")
+
+    os.makedirs(out_dir, exist_ok=True)
+    # One chunk per worker: ratio_rows() is cheapest over many FTPs at once
+    return parallel_map(_export_chunk, roster, workout, out_dir, name, jobs=jobs, chunks_per_job=1)
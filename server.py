@@ -0,0 +1,291 @@
+"""Local HTTP/JSON workout rendering service for `python main.py serve`"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+
+import exporters
+from blocks import from_dict
+from workout import Workout
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Rendered workouts kept for repeat downloads
+CACHE_SIZE = 256
+
+# Largest request body accepted, in bytes
+MAX_BODY = 8 * 1024 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+_CONTENT_TYPES = {"zwo": "application/xml", "erg": "text/plain", "mrc": "text/plain",
+                  "csv": "text/csv"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class RenderCache:
+    """
+    Bounded LRU of rendered results by request key. hits/misses count
+    requests, not lookups: the server records a request that joins an
+    in-flight render as a hit, so they match the X-Zwerminal-Cache headers.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        result = self._items.get(key)
+        if result is not None:
+            self._items.move_to_end(key)
+        return result
+
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, key, result):
+        self._items[key] = result
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+
+def parse_request(payload):
+    """
+    Validate a render request. Returns (key, blocks, ftp, name, fmt); the
+    key hashes the typed blocks, so equivalent inputs (e.g. "300s" and
+    300, or reordered fields) share one cache entry.
+    """
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    ftp = payload.get("ftp")
+    if isinstance(ftp, bool) or not isinstance(ftp, int) or ftp <= 0:
+        raise HTTPError(400, "ftp must be a positive integer")
+    name = str(payload.get("name") or "Custom Workout")
+    fmt = str(payload.get("format") or "zwo").lower()
+    if fmt not in exporters.FORMATS:
+        raise HTTPError(400, f"Unknown format: {fmt}. Use {', '.join(exporters.FORMATS)}.")
+    raw = payload.get("blocks")
+    if not isinstance(raw, list) or not raw:
+        raise HTTPError(400, "blocks must be a non-empty list")
+    try:
+        blocks = [from_dict(d) for d in raw]
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPError(400, f"Invalid block: {e}")
+    normalized = json.dumps([ftp, name, fmt, [b.key() for b in blocks]])
+    key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return key, blocks, ftp, name, fmt
+
+
+def render(blocks, ftp, name, fmt) -> dict:
+    """Rendered file plus summary metrics for one request"""
+    w = Workout()
+    w.ftp = ftp
+    w._insert(0, blocks)
+    return {
+        "name": name,
+        "ftp": ftp,
+        "format": fmt,
+        "seconds": w.total_seconds(),
+        "tss": w.estimate_tss(),
+        "avg_if": round(w.average_if(), 3),
+        "elements": w.compiled().elements,
+        "content": "".join(w.iter_format(fmt, name=name)),
+    }
+
+
+class WorkoutServer:
+    """
+    asyncio HTTP/1.1 server (keep-alive, one request at a time per
+    connection). Rendering runs on worker threads so the event loop keeps
+    accepting connections, and concurrent requests for the same key share
+    a single render.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, cache_size=CACHE_SIZE, log=None):
+        self.port = port
+        self.cache = RenderCache(cache_size)
+        self.log = log  # optional callable(str) per request
+        self.requests = 0
+        self._inflight = {}  # key -> asyncio.Future of the render
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, HOST, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # port 0 picks a free one
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._respond(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, request_line, reader, writer):
+        """Read one request and write its response; returns whether to keep the connection"""
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get("connection", "").lower() != "close"
+        try:
+            method, path, version = request_line.decode("latin-1").split()
+        except ValueError:
+            self._send(writer, 400, _json_body({"error": "Malformed request line"}), False)
+            return False
+        if version == "HTTP/1.0":
+            keep_alive = headers.get("connection", "").lower() == "keep-alive"
+
+        self.requests += 1
+        extra = {}
+        try:
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                keep_alive = False  # the unread body would corrupt the next request
+                raise HTTPError(413, f"Body larger than {MAX_BODY} bytes")
+            body = await reader.readexactly(length) if length else b""
+            status, content_type, data, extra = await self._route(method, path.split("?")[0], body)
+        except HTTPError as e:
+            status, content_type, data = e.status, "application/json", _json_body({"error": str(e)})
+        except asyncio.IncompleteReadError:
+            return False
+        except Exception as e:  # keep serving after a bug in one request
+            status, content_type, data = 500, "application/json", _json_body({"error": str(e)})
+
+        if self.log:
+            self.log(f"{method} {path} {status} {extra.get('X-Zwerminal-Cache', '')}".rstrip())
+        self._send(writer, status, data, keep_alive, content_type, extra)
+        return keep_alive
+
+    async def _route(self, method, path, body):
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            return 200, "application/json", _json_body(
+                {"ok": True, "requests": self.requests, "cache": self.cache.stats()}), {}
+
+        if path == "/render" or path.startswith("/render."):
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            if path != "/render" and isinstance(payload, dict):
+                payload = dict(payload, format=path.rsplit(".", 1)[1])
+            key, blocks, ftp, name, fmt = parse_request(payload)
+            result, cached = await self._render(key, blocks, ftp, name, fmt)
+            headers = {"X-Zwerminal-Cache": "hit" if cached else "miss"}
+            if path == "/render":
+                return 200, "application/json", _json_body(dict(result, cached=cached)), headers
+            headers.update({
+                "X-Zwerminal-Seconds": str(result["seconds"]),
+                "X-Zwerminal-TSS": str(result["tss"]),
+                "X-Zwerminal-IF": str(result["avg_if"]),
+            })
+            return 200, _CONTENT_TYPES[fmt], result["content"].encode("utf-8"), headers
+
+        raise HTTPError(404, f"No such endpoint: {path}")
+
+    async def _render(self, key, blocks, ftp, name, fmt):
+        """(result, served from cache)"""
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.record(True)
+            return result, True
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.cache.record(True)
+            return await asyncio.shield(pending), True
+        self.cache.record(False)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await asyncio.to_thread(render, blocks, ftp, name, fmt)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so waiters are optional
+            raise
+        finally:
+            del self._inflight[key]
+        self.cache.put(key, result)
+        future.set_result(result)
+        return result, False
+
+    @staticmethod
+    def _send(writer, status, data, keep_alive, content_type="application/json", extra=None):
+        lines = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}; charset=utf-8",
+            f"Content-Length: {len(data)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        lines.extend(f"{k}: {v}" for k, v in (extra or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+
+
+def _json_body(obj) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
+def serve(port=DEFAULT_PORT, cache_size=CACHE_SIZE, log=print):
+    """Run the service until interrupted"""
+    server = WorkoutServer(port, cache_size, log)
+
+    async def run():
+        await server.start()
+        log(f"Serving on http://{HOST}:{server.port} (Ctrl+C to stop)")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+import json
+import os
+import time
+
+from blocks import from_dict
+from fsutil import atomic_write
+from workout import Workout
+from zones import get_model
+
+DEFAULT_DIR = ".zwerminal-session"
+SNAPSHOT_FILE = "snapshot.json"
+JOURNAL_FILE = "journal.jsonl"
+
+# Every entry is flushed to the OS as it is written, so it survives the
+# process dying; fsync (surviving power loss) is batched to this many
+# entries or seconds, whichever comes first
+SYNC_EVERY = 32
+SYNC_INTERVAL = 1.0
+
+# Compact into a new snapshot once the journal holds at least this many
+# entries and at least as many as the workout has blocks, so snapshot cost
+# stays amortized O(1) per edit.
+SNAPSHOT_MIN = 256
+
+
+def _entry(op, reverse):
+    """Journal entry (a dict) for an undo-history op applied in one direction"""
+    kind = op[0]
+    if kind == "ftp":
+        return {"op": "ftp", "ftp": op[1] if reverse else op[2]}
+    if kind == "zones":
+        return {"op": "zones", "model": op[1] if reverse else op[2]}
+    if kind == "replace":
+        return {"op": "replace", "i": op[1], "block": (op[2] if reverse else op[3]).to_dict()}
+    if kind == "splice":
+        old, new = (op[3], op[2]) if reverse else (op[2], op[3])
+        return {"op": "splice", "i": op[1], "n": len(old), "blocks": [b.to_dict() for b in new]}
+    if (kind == "insert") != reverse:
+        return {"op": "insert", "i": op[1], "blocks": [b.to_dict() for b in op[2]]}
+    return {"op": "delete", "i": op[1], "n": len(op[2])}
+
+
+def _apply_entry(workout, e):
+    kind = e["op"]
+    if kind == "ftp":
+        workout.ftp = e["ftp"]
+    elif kind == "zones":
+        workout.set_zone_model(get_model(e["model"]))
+    elif kind == "replace":
+        workout._replace(e["i"], from_dict(e["block"]))
+    elif kind == "splice":
+        workout._splice(e["i"], e["n"], [from_dict(d) for d in e["blocks"]])
+    elif kind == "insert":
+        workout._insert(e["i"], [from_dict(d) for d in e["blocks"]])
+    elif kind == "delete":
+        workout._remove(e["i"], e["n"])
+    else:
+        raise ValueError(f"Unknown journal entry: {kind}")
+
+
+class Journal:
+    """
+    Autosave for one workout: every change is appended to a journal as a
+    single JSON line (flushed at once, fsync'd in batches), and the journal is periodically
+    compacted into a JSON snapshot. Entries carry a sequence number and the
+    snapshot records the last one it includes, so a crash between writing
+    a snapshot and truncating the journal never replays an entry twice.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, sync_every=SYNC_EVERY,
+                 sync_interval=SYNC_INTERVAL, snapshot_min=SNAPSHOT_MIN):
+        self.directory = directory
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.snapshot_min = snapshot_min
+        self.workout = None
+        self.seq = 0
+        self._file = None
+        self._entries = 0   # entries in the journal since the last snapshot
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def attach(self, workout, seq=None):
+        """Start journaling workout, writing a fresh snapshot of its current state"""
+        if self.workout is not None:
+            self.workout.journal = None
+        self.workout = workout
+        if seq is not None:
+            self.seq = seq
+        workout.journal = self.append
+        self.snapshot()
+
+    def append(self, op, reverse=False):
+        """Workout.journal callback: log one change (called before it is applied)"""
+        # Every earlier entry has been applied by now, so this is the point
+        # where the workout matches self.seq and can be snapshotted.
+        if self._entries >= max(self.snapshot_min, len(self.workout.blocks)):
+            self.snapshot()
+        self.seq += 1
+        entry = _entry(op, reverse)
+        entry["seq"] = self.seq
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._entries += 1
+        self._unsynced += 1
+        if (self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval):
+            self.sync()
+
+    def sync(self):
+        """fsync pending journal entries"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def snapshot(self):
+        """Write the whole workout to the snapshot file and truncate the journal"""
+        w = self.workout
+        data = {
+            "version": 1,
+            "seq": self.seq,
+            "ftp": w.ftp,
+            "zones": w.zone_model.name,
+            "blocks": [b.to_dict() for b in w.blocks],
+        }
+        atomic_write(os.path.join(self.directory, SNAPSHOT_FILE),
+                     lambda f: json.dump(data, f, separators=(",", ":")))
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.directory, JOURNAL_FILE), "w", encoding="utf-8")
+        os.fsync(self._file.fileno())
+        self._entries = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """Sync and stop journaling"""
+        self.sync()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.workout is not None:
+            self.workout.journal = None
+            self.workout = None
+
+
+def resume(directory=DEFAULT_DIR, zone_model=None):
+    """
+    Rebuild the autosaved workout from the newest snapshot plus the journal
+    tail. A torn last line (crash mid-write) is ignored. zone_model is used
+    when the session didn't record one (saved by an older version).
+    Returns (workout, seq) where seq is the last entry applied.
+    """
+    snap_path = os.path.join(directory, SNAPSHOT_FILE)
+    if not os.path.exists(snap_path):
+        raise ValueError(f"No saved session in {directory}")
+    with open(snap_path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    workout = Workout()
+    workout.ftp = data.get("ftp")
+    if data.get("zones"):
+        workout.set_zone_model(get_model(data["zones"]))
+    elif zone_model is not None:
+        workout.set_zone_model(zone_model)
+    workout._insert(0, [from_dict(d) for d in data.get("blocks", ())])
+    seq = data.get("seq", 0)
+
+    journal_path = os.path.join(directory, JOURNAL_FILE)
+    if os.path.exists(journal_path):
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn write at the tail
+                if entry.get("seq", 0) <= seq:
+                    continue  # already in the snapshot
+                _apply_entry(workout, entry)
+                seq = entry["seq"]
+    return workout, seq
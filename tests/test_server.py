@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+STEADY = {"type": "steady", "zone": "Z3", "duration": 600, "power_mode": "zone"}
+INTERVAL = {"type": "interval", "power1": 300, "dur1": 60, "power2": 150, "dur2": 60, "reps": 4}
+
+
+class RenderValidationTest(unittest.IsolatedAsyncioTestCase):
+    """Blocks that the constructors reject must come back as 400, and never be cached"""
+
+    async def asyncSetUp(self):
+        self.server = await server.WorkoutServer(port=0).start()
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def post(self, path, payload):
+        reader, writer = await asyncio.open_connection(server.HOST, self.server.port)
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        response = await reader.read()
+        writer.close()
+        await writer.wait_closed()
+        head, _, data = response.partition(b"\r\n\r\n")
+        return int(head.split()[1]), data
+
+    async def test_valid_request_renders(self):
+        status, data = await self.post("/render", {"ftp": 250, "blocks": [STEADY, INTERVAL]})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(data)["seconds"], 600 + 4 * 120)
+
+    async def test_invalid_blocks_are_rejected(self):
+        bad_blocks = [
+            dict(INTERVAL, reps=0),
+            dict(INTERVAL, reps=-2),
+            dict(INTERVAL, power1=-300),
+            dict(INTERVAL, power2=-1),
+            {"type": "steady", "zone": "Z2", "duration": 600, "power": -200},
+            {"type": "warmup", "power_start": -100, "power_end": 200, "duration": 600},
+            {"type": "cooldown", "power_start": 200, "power_end": -100, "duration": 600},
+        ]
+        for block in bad_blocks:
+            for path in ("/render", "/render.zwo"):
+                with self.subTest(block=block, path=path):
+                    status, data = await self.post(path, {"ftp": 250, "blocks": [STEADY, block]})
+                    self.assertEqual(status, 400)
+                    self.assertIn("Invalid block", json.loads(data)["error"])
+        self.assertEqual(self.server.cache.stats()["size"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Spec file polling and change detection for `python main.py watch`"""
+import hashlib
+import os
+import time
+
+# Seconds between polls of the spec file
+INTERVAL = 0.1
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def changes(path, interval=INTERVAL):
+    """
+    Yield the spec's lines once at the start and again after every change.
+    A missing or unreadable spec (e.g. mid-save) is skipped until it can
+    be read. Runs until interrupted.
+    """
+    seen = None
+    while True:
+        sig = _signature(path)
+        if sig is not None and sig != seen:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            except (OSError, UnicodeDecodeError):
+                pass  # retried on the next poll
+            else:
+                seen = sig
+                yield lines
+        time.sleep(interval)
+
+
+def first_change(old, new):
+    """Index of the first command that differs between two lists, or None if they are equal"""
+    for i, (a, b) in enumerate(zip(old, new)):
+        if a != b:
+            return i
+    if len(old) == len(new):
+        return None
+    return min(len(old), len(new))
+
+
+def content_hash(text) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path):
+    """content_hash() of a file as it is on disk, or None if it can't be read"""
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            return content_hash(f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
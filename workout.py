@@ -1,302 +1,502 @@
 import os
-import re
-from rich.table import Table
-from rich.console import Console
-from rich.text import Text
+from array import array
+from collections import deque
+from blocks import BLOCK_TYPES, iter_leaves, make_block, to_seconds
+from optimizer import optimize_blocks
+import exporters
+import metrics
+from fsutil import atomic_write
+from ir import compile_blocks
+from zones import DEFAULT_MODEL
+
+# Number of undo steps kept per workout
+HISTORY_LIMIT = 10000
+
+# Upper bounds of Z1..Z5 as a fraction of FTP (default zone model)
+ZONE_BOUNDS = DEFAULT_MODEL.bounds
 
 class Workout:
     def __init__(self):
-        self.blocks = []  # list of block‐dicts
+        self.blocks = []  # list of typed blocks (see blocks.py)
         self.clipboard = []  # Initialize as empty list instead of None
         self.ftp = None  
+        self.zone_model = DEFAULT_MODEL  # zones.ZoneModel for zone targets and metrics
+
+        # Running aggregates for the summary bar. Absolute blocks are summed
+        # in watts and relative (%FTP) blocks in ratios, so an FTP change
+        # never invalidates them; mutate blocks through the methods below
+        # (or call rebuild_totals) to keep them in sync.
+        self._total_sec = 0
+        self._watt_sec = 0.0    # sum(avg_watts * sec) of absolute blocks
+        self._watt2_sec = 0.0   # sum(avg_watts**2 * sec) of absolute blocks
+        self._ratio_sec = 0.0   # sum(ratio * sec) of relative blocks
+        self._ratio2_sec = 0.0  # sum(ratio**2 * sec) of relative blocks
+
+        # Bumped on every mutation; lazily built caches (power stream,
+        # metrics) remember the revision they were built at.
+        self._revision = 0
+        self._stream_cache = None  # (revision, ftp, array)
+        self._metrics_cache = None  # (revision, ftp, zone model, dict)
+        self._program_cache = None  # (revision, ir.Program)
+        self._ratio_cache = None  # (revision, ftp, ratio row)
+
+        # Undo/redo history of small operation deltas, e.g.
+        # ("replace", index, old_block, new_block). Blocks are never edited
+        # in place, so deltas share block objects instead of copying them.
+        self._undo = deque(maxlen=HISTORY_LIMIT)
+        self._redo = []
+
+        # Optional callable(op, reverse) told about every change just before
+        # it is applied (see session.Journal); undo passes reverse=True.
+        self.journal = None
+
+    @classmethod
+    def from_zwo(cls, source, ftp, zone_model=DEFAULT_MODEL):
+        """Build a workout from a .zwo file path or file object, using ftp to convert ratios to watts"""
+        from zwo_reader import iter_zwo_blocks  # pulls in xml.etree; only needed here
+
+        workout = cls()
+        workout.ftp = ftp
+        workout.set_zone_model(zone_model)
+        for block_type, params in iter_zwo_blocks(source, ftp):
+            workout.add_block(block_type, **params)
+        workout._undo.clear()
+        return workout
 
     def add_block(self, block_type, **params):
         """
         Add a workout block 
-        block_type: "steady", "warmup", "cooldown", or "interval"
-        steady expects:   zone, duration, power
+        block_type: "steady", "warmup", "cooldown", "interval" or "repeat"
+        steady expects:   zone, duration, power (or power_mode="zone" / ratio
+                          to store intensity relative to FTP)
         warmup/cooldown: power_start, power_end, duration (in seconds)
         interval:        power1, dur1, power2, dur2, reps
+        repeat:          blocks, count (blocks are shared, not copied)
         """
-        if not block_type or block_type not in ["steady", "warmup", "cooldown", "interval"]:
+        if not block_type or block_type not in BLOCK_TYPES:
             raise ValueError(f"Invalid block type: {block_type}")
-            
-        blk = {"type": block_type}
-        
-        try:
-            if block_type == "steady":
-                blk["zone"] = str(params.get("zone", "Z1")).upper()
-                blk["duration"] = str(params.get("duration", "0s"))
-                blk["power"] = int(params.get("power", 0))
-                blk["power_mode"] = params.get("power_mode", "custom")
+        if (block_type == "steady" and params.get("power_mode") == "zone"
+                and params.get("ratio") is None):
+            params["ratio"] = self.zone_model.target(params.get("zone"))
 
-                
-            elif block_type in ("warmup", "cooldown"):
-                blk["power_start"] = int(params.get("power_start", 0))
-                blk["power_end"] = int(params.get("power_end", 0))
-                blk["duration"] = int(params.get("duration", 0))
-                
-            elif block_type == "interval":
-                blk["power1"] = int(params.get("power1", 0))
-                blk["dur1"] = int(params.get("dur1", 0))  
-                blk["power2"] = int(params.get("power2", 0))
-                blk["dur2"] = int(params.get("dur2", 0))
-                blk["reps"] = int(params.get("reps", 1))
-                
+        try:
+            blk = make_block(block_type, **params)
         except (ValueError, TypeError) as e:
             raise ValueError(f"Invalid parameters for {block_type} block: {e}")
             
-        self.blocks.append(blk)
+        self._record(("insert", len(self.blocks), (blk,)))
+        self._insert(len(self.blocks), (blk,))
+
+    def extend_blocks(self, blocks):
+        """Append copies of the given blocks (used by paste)"""
+        new_blocks = tuple(b.copy() for b in blocks)
+        if new_blocks:
+            self._record(("insert", len(self.blocks), new_blocks))
+            self._insert(len(self.blocks), new_blocks)
 
     def edit_block(self, index, zone=None, duration=None, power=None):
-        """Edit a block"""
+        """
+        Edit a block.
+        Setting a zone (a label of the zone model) makes a steady block
+        zone-synced (relative to FTP); setting power makes it absolute with
+        an auto-detected zone.
+        """
         if not (0 <= index < len(self.blocks)):
             raise IndexError(f"Block index {index} out of range")
             
         block = self.blocks[index]
+        changes = {}
         
         try:
             if zone is not None:
-                if zone.upper() not in ["Z1", "Z2", "Z3", "Z4", "Z5", "Z6", "AUTO"]:
+                if zone.upper() != "AUTO" and zone.upper() not in self.zone_model.labels:
                     raise ValueError(f"Invalid zone: {zone}")
-                block["zone"] = zone.upper()
+                changes["zone"] = zone.upper()
+                ratio = self.zone_model.target(changes["zone"])
+                if ratio is not None:
+                    changes["power_mode"] = "zone"
+                    changes["ratio"] = ratio
                 
             if duration is not None:
-                # Validate duration format
-                if isinstance(duration, str) and duration.endswith('s'):
-                    dur_seconds = int(duration[:-1])
-                    if dur_seconds <= 0:
-                        raise ValueError("Duration must be positive")
-                block["duration"] = duration
+                dur_seconds = to_seconds(duration)
+                if dur_seconds <= 0:
+                    raise ValueError("Duration must be positive")
+                changes["duration"] = dur_seconds
                 
             if power is not None:
                 power_val = int(power)
                 if power_val < 0:
                     raise ValueError("Power cannot be negative")
-                block["power"] = power_val
+                if zone is not None:
+                    raise ValueError("Cannot set both zone and power")
+                changes["power"] = power_val
+                changes["power_mode"] = "custom"
+                changes["ratio"] = None
+                changes["zone"] = "AUTO"
+
+            for key, value in (("zone", zone), ("duration", duration), ("power", power)):
+                if value is not None and key not in block:
+                    raise ValueError(f"{block.type} blocks have no {key}")
+            new_block = block.replace(**changes)
                 
         except (ValueError, TypeError) as e:
             raise ValueError(f"Invalid edit parameters: {e}")
 
+        self._record(("replace", index, block, new_block))
+        self._replace(index, new_block)
+
     def delete_block(self, index):
         """Delete a block"""
         if not (0 <= index < len(self.blocks)):
             raise IndexError(f"Block index {index} out of range")
-        self.blocks.pop(index)
+        self._record(("delete", index, (self.blocks[index],)))
+        self._remove(index, 1)
+
+    def set_ftp(self, ftp):
+        """Set FTP (undoable)"""
+        self._record(("ftp", self.ftp, ftp))
+        self.ftp = ftp
+
+    def snapshot(self):
+        """
+        Detached copy for background work (e.g. exports): shares the
+        blocks, which are never edited in place, and has no history.
+        """
+        copy = Workout()
+        copy.ftp = self.ftp
+        copy.zone_model = self.zone_model
+        copy.blocks = list(self.blocks)
+        copy._revision = self._revision
+        copy._program_cache = self._program_cache
+        copy._ratio_cache = self._ratio_cache
+        (copy._total_sec, copy._watt_sec, copy._watt2_sec, copy._ratio_sec,
+         copy._ratio2_sec) = (self._total_sec, self._watt_sec, self._watt2_sec,
+                              self._ratio_sec, self._ratio2_sec)
+        return copy
+
+    def optimize(self):
+        """
+        Rewrite the block list through optimizer.optimize_blocks (undoable).
+        Returns (elements_before, elements_after) in the exported ZWO.
+        """
+        before = self.zwo_element_count()
+        new_blocks = tuple(optimize_blocks(self.blocks))
+        if list(new_blocks) != self.blocks:
+            old_blocks = tuple(self.blocks)
+            self._record(("splice", 0, old_blocks, new_blocks))
+            self._splice(0, len(old_blocks), new_blocks)
+        return before, self.zwo_element_count()
+
+    def set_blocks(self, blocks):
+        """Replace the whole block list (undoable), e.g. with a generated session"""
+        old_blocks, new_blocks = tuple(self.blocks), tuple(blocks)
+        self._record(("splice", 0, old_blocks, new_blocks))
+        self._splice(0, len(old_blocks), new_blocks)
+
+    def optimized(self):
+        """Optimized copy of this workout (same FTP, no history), e.g. for export"""
+        copy = Workout()
+        copy.ftp = self.ftp
+        copy._insert(0, optimize_blocks(self.blocks))
+        return copy
+
+    def zwo_element_count(self) -> int:
+        """Number of workout elements the ZWO export would contain"""
+        if not self.blocks:
+            return 0
+        return self.compiled().elements
 
-    def export(self, filepath, name="Custom Workout"):
-        """Export"""
+    # ---- undo / redo ----
+    def undo(self):
+        """Revert the last change; returns its kind ("insert", "delete", "replace", "splice", "ftp") or None"""
+        if not self._undo:
+            return None
+        op = self._undo[-1]
+        if self.journal is not None:
+            self.journal(op, True)  # first: if it raises, nothing has changed
+        self._undo.pop()
+        self._apply_op(op, reverse=True)
+        self._redo.append(op)
+        return op[0]
+
+    def redo(self):
+        """Re-apply the last undone change; returns its kind or None"""
+        if not self._redo:
+            return None
+        op = self._redo[-1]
+        if self.journal is not None:
+            self.journal(op, False)
+        self._redo.pop()
+        self._apply_op(op)
+        self._undo.append(op)
+        return op[0]
+
+    def history_depth(self) -> int:
+        """Number of changes that can currently be undone"""
+        return len(self._undo)
+
+    def rewind(self, depth) -> bool:
+        """
+        Undo back to an earlier history_depth() and drop the redo history.
+        Returns False (changing nothing) when that point is out of reach:
+        already undone past, or possibly trimmed off at HISTORY_LIMIT.
+        """
+        steps = len(self._undo) - depth
+        if steps < 0 or len(self._undo) == self._undo.maxlen:
+            return False
+        for _ in range(steps):
+            self.undo()
+        self._redo.clear()
+        return True
+
+    def _record(self, op):
+        """Log a change about to be applied: journal first, so a failed write leaves no trace"""
+        if self.journal is not None:
+            self.journal(op, False)
+        self._undo.append(op)
+        self._redo.clear()
+
+    def _apply_op(self, op, reverse=False):
+        kind = op[0]
+        if kind == "ftp":
+            self.ftp = op[1] if reverse else op[2]
+        elif kind == "replace":
+            self._replace(op[1], op[2] if reverse else op[3])
+        elif kind == "splice":
+            old, new = (op[3], op[2]) if reverse else (op[2], op[3])
+            self._splice(op[1], len(old), new)
+        elif (kind == "insert") != reverse:
+            self._insert(op[1], op[2])
+        else:
+            self._remove(op[1], len(op[2]))
+
+    # ---- primitive mutations (keep totals and revision in sync) ----
+    def _insert(self, index, blocks):
+        self.blocks[index:index] = blocks
+        for b in blocks:
+            self._apply_totals(self._block_totals(b))
+        self._revision += 1
+
+    def _remove(self, index, count):
+        removed = self.blocks[index:index + count]
+        del self.blocks[index:index + count]
+        for b in removed:
+            self._apply_totals(self._block_totals(b), sign=-1)
+        self._revision += 1
+
+    def _splice(self, index, count, blocks):
+        self._remove(index, count)
+        self._insert(index, blocks)
+
+    def _replace(self, index, block):
+        old = self.blocks[index]
+        self.blocks[index] = block
+        self._apply_totals(self._block_totals(old), sign=-1)
+        self._apply_totals(self._block_totals(block))
+        self._revision += 1
+
+    def export(self, filepath, name="Custom Workout", ratios=None, fmt=None, ftp=None):
+        """
+        Export to a file; the format (zwo, erg, mrc or csv) comes from fmt
+        or the file extension and defaults to zwo.
+        ftp: write for another FTP than the workout's; ratios: a precomputed
+        row from ratio_rows() (zwo/mrc only).
+        Written through a temp file in the same directory and moved into
+        place with os.replace, so a crash never leaves a half-written file.
+        """
         if not self.blocks:
             raise ValueError("Cannot export empty workout")
-            
-        if self.ftp is None or self.ftp <= 0:
+
+        ftp = ftp or self.ftp
+        if ratios is None and (ftp is None or ftp <= 0):
             raise ValueError("FTP must be set before exporting")
-            
+        fmt = fmt or exporters.format_for_path(filepath)
+
         try:
-            # Ensure directory exists
-            dir_path = os.path.dirname(filepath)
-            if dir_path:
-                os.makedirs(dir_path, exist_ok=True)
-                
-            with open(filepath, "w", encoding='utf-8') as f:
-                f.write(self.to_zwo(name=name))
+            atomic_write(filepath, lambda f: self.write(f, name=name, fmt=fmt, ratios=ratios, ftp=ftp))
         except (OSError, IOError) as e:
             raise IOError(f"Failed to write file {filepath}: {e}")
 
+    def write(self, fileobj, name="Custom Workout", fmt="zwo", buffer_size=64 * 1024,
+              ratios=None, ftp=None):
+        """Stream any export format to a file-like object in chunks of ~buffer_size chars"""
+        buf = []
+        size = 0
+        for line in self.iter_format(fmt, name=name, ratios=ratios, ftp=ftp):
+            buf.append(line)
+            size += len(line)
+            if size >= buffer_size:
+                fileobj.write("".join(buf))
+                buf.clear()
+                size = 0
+        if buf:
+            fileobj.write("".join(buf))
+
+    def write_zwo(self, fileobj, name="Custom Workout", buffer_size=64 * 1024, ratios=None):
+        """Stream ZWO to any file-like object in chunks of ~buffer_size chars"""
+        self.write(fileobj, name=name, fmt="zwo", buffer_size=buffer_size, ratios=ratios)
+
     def to_zwo(self, name="Custom Workout"):
-        """Generate ZWO"""
-        if self.ftp is None or self.ftp <= 0:
-            raise ValueError("FTP must be set to generate ZWO file")
-            
-        def to_sec(d):
-            """Convert duration to seconds with validation"""
-            if isinstance(d, int):
-                return max(0, d)  # Ensure non-negative
-            if isinstance(d, str):
-                # Strip 's' suffix and convert
-                duration_str = d.rstrip('s')
-                try:
-                    return max(0, int(duration_str))
-                except ValueError:
-                    return 0
-            return 0
+        """Generate ZWO as a single string"""
+        return "".join(self.iter_zwo(name=name))
 
-        def ratio(p):
-            """Convert power to FTP ratio with validation"""
-            try:
-                power_val = float(p)
-                if power_val < 0:
-                    power_val = 0
-                return round(power_val / self.ftp, 6)
-            except (ValueError, TypeError, ZeroDivisionError):
-                return 0.0
-
-        lines = []
-        lines.append('<?xml version="1.0" encoding="UTF-8"?>')
-        lines.append("<workout_file>")
-        lines.append(f"  <name>{self._escape_xml(name)}</name>")
-        lines.append("  <description></description>")
-        lines.append("  <sportType>bike</sportType>")
-        lines.append("  <tags/>")
-        lines.append("  <workout>")
-
-        for i, b in enumerate(self.blocks):
-            try:
-                btype = b.get("type", "steady")
-
-                if btype == "steady":
-                    dur = to_sec(b.get("duration", 0))
-                    if dur <= 0:
-                        continue  # Skip invalid blocks
-                    p_ratio = ratio(b.get("power", 0))
-                    lines.append(
-                        f'    <SteadyState Duration="{dur}" Power="{p_ratio}" pace="0"/>'
-                    )
-
-                elif btype == "warmup":
-                    dur = to_sec(b.get("duration", 0))
-                    if dur <= 0:
-                        continue
-                    low = ratio(b.get("power_start", 0))
-                    high = ratio(b.get("power_end", 0))
-                    lines.append(
-                        f'    <Warmup Duration="{dur}" PowerLow="{low}" PowerHigh="{high}" pace="0"/>'
-                    )
-
-                elif btype == "cooldown":
-                    dur = to_sec(b.get("duration", 0))
-                    if dur <= 0:
-                        continue
-                    high = ratio(b.get("power_start", 0))  # Note: reversed for cooldown
-                    low = ratio(b.get("power_end", 0))
-                    lines.append(
-                        f'    <Cooldown Duration="{dur}" PowerLow="{low}" PowerHigh="{high}" pace="0"/>'
-                    )
-
-                elif btype == "interval":
-                    reps = max(1, b.get("reps", 1))
-                    on_d = to_sec(b.get("dur1", 0))
-                    off_d = to_sec(b.get("dur2", 0))
-                    if on_d <= 0 or off_d <= 0:
-                        continue  # Skip invalid intervals
-                    on_p = ratio(b.get("power1", 0))
-                    off_p = ratio(b.get("power2", 0))
-                    lines.append(
-                        f'    <IntervalsT Repeat="{reps}" OnDuration="{on_d}" OffDuration="{off_d}" '
-                        f'OnPower="{on_p}" OffPower="{off_p}" pace="0"/>'
-                    )
-
-            except Exception as e:
-                # Log the error but continue processing other blocks
-                print(f"Warning: Skipping block {i} due to error: {e}")
-                continue
-
-        lines.append("  </workout>")
-        lines.append("</workout_file>")
-        return "\n".join(lines)
-
-    def _escape_xml(self, text):
-        """Escape XML special characters"""
-        if not isinstance(text, str):
-            text = str(text)
-        return (text.replace("&", "&amp;")
-                   .replace("<", "&lt;")
-                   .replace(">", "&gt;")
-                   .replace('"', "&quot;")
-                   .replace("'", "&#39;"))
+    def iter_zwo(self, name="Custom Workout", ratios=None):
+        """
+        Generate ZWO line by line.
+        ratios: optional precomputed row from ratio_rows(); defaults to
+        the workout's own FTP.
+        """
+        return self.iter_format("zwo", name=name, ratios=ratios)
+
+    def iter_format(self, fmt, name="Custom Workout", ratios=None, ftp=None):
+        """Generate an export format (see exporters.FORMATS) line by line"""
+        backend = exporters.FORMATS.get(fmt)
+        if backend is None:
+            raise ValueError(f"Unknown export format: {fmt}")
+        ftp = ftp or self.ftp
+        if ratios is None:
+            if ftp is None or ftp <= 0:
+                raise ValueError(f"FTP must be set to generate {fmt.upper()} file")
+            ratios = self.ratio_row(ftp)
+        return backend(self.compiled(), ratios, name, ftp)
+
+    def compiled(self):
+        """The block list compiled for export (ir.Program), cached until the next edit"""
+        cache = self._program_cache
+        if cache is None or cache[0] != self._revision:
+            cache = self._program_cache = (self._revision, compile_blocks(self.blocks))
+        return cache[1]
+
+    def ratio_row(self, ftp):
+        """ratio_rows() row for one FTP, cached until the next edit"""
+        cache = self._ratio_cache
+        if cache is None or cache[0] != self._revision or cache[1] != ftp:
+            cache = self._ratio_cache = (self._revision, ftp, next(self.ratio_rows([ftp])))
+        return cache[2]
+
+    def ratio_rows(self, ftps):
+        """
+        Yield one flat row of FTP ratios per FTP, two slots per leaf block
+        in iter_leaves() order (start/end or on/off; steady blocks only use
+        the first). Repeat segments contribute their children once.
+        Block watts are gathered once and each FTP is then a single pass
+        over them; relative blocks keep their stored ratio at every FTP.
+        """
+        watts = []
+        relative_slots = []
+        for i, b in enumerate(iter_leaves(self.blocks)):
+            btype = b.type
+            if btype == "steady":
+                if b.relative:
+                    watts += (0, 0)
+                    relative_slots.append((2 * i, round(b.ratio, 6)))
+                else:
+                    watts += (b.power, 0)
+            elif btype in ("warmup", "cooldown"):
+                watts += (b.power_start, b.power_end)
+            elif btype == "interval":
+                watts += (b.power1, b.power2)
+            else:
+                watts += (0, 0)
+        watts = [max(0, w) for w in watts]
+
+        for ftp in ftps:
+            if not ftp or ftp <= 0:
+                raise ValueError(f"Invalid FTP: {ftp}")
+            row = array("d", [round(w / ftp, 6) for w in watts])
+            for slot, ratio in relative_slots:
+                row[slot] = ratio
+            yield row
+
+    def set_zone_model(self, model):
+        """
+        Use a zones.ZoneModel for zone labels, zone targets and time in
+        zone. Blocks already set by zone keep their intensity.
+        """
+        if model.basis != "power":
+            raise ValueError(f"The {model.name} zone model is for heart rate; workouts are built in power")
+        if model is self.zone_model:
+            return
+        if self.journal is not None:  # journaled so resume restores it; not undoable
+            self.journal(("zones", self.zone_model.name, model.name), False)
+        self.zone_model = model
 
     def _zone_color(self, zone):
         """Get color for zone with fallback"""
-        color_map = {
-            "Z1": "grey",
-            "Z2": "blue", 
-            "Z3": "green",
-            "Z4": "yellow",
-            "Z5": "orange1",
-            "Z6": "red",
-            "AUTO": "white"
-        }
-        return color_map.get(str(zone).upper(), "white")
+        return self.zone_model.color(zone)
 
     
     def _power_to_zone(self, power):
         """Convert power to zone"""
-        if self.ftp is None or self.ftp <= 0:
-            return "Z?"
-        
-        try:
-            power = float(power)
-            if power < 0:
-                return "Z?"
-            pct = (power / self.ftp) * 100
-            if pct < 60:
-                return "Z1"
-            elif pct < 76:
-                return "Z2"
-            elif pct < 90:
-                return "Z3"
-            elif pct < 105:
-                return "Z4"
-            elif pct < 119:
-                return "Z5"
-            else:
-                return "Z6"
-        except (ValueError, TypeError):
-            return "Z?"
+        return self.zone_model.classify(power, self.ftp)
 
     def _zone_to_power(self, zone):
         """Convert zone to power"""
         if self.ftp is None or self.ftp <= 0:
             return None
-            
-        try:
-            zperc = {
-                "Z1": 0.55,
-                "Z2": 0.65,
-                "Z3": 0.80,
-                "Z4": 0.95,
-                "Z5": 1.10,
-                "Z6": 1.25
-            }.get(zone.upper(), None)
-            return int(self.ftp * zperc) if zperc is not None else None
-        except (ValueError, TypeError):
-            return None
+        ratio = self.zone_model.target(zone)
+        return int(self.ftp * ratio) if ratio is not None else None
 
-    def _block_seconds(self, b: dict) -> int:
+    def _block_seconds(self, b) -> int:
         """Return block duration in seconds for any block type."""
-        t = b.get("duration")
-        if t is not None:
-            return int(t) if isinstance(t, int) else int(re.sub(r"[^\d]", "", str(t)))
+        return b.seconds
 
-        if b["type"] == "interval":
-            # Each rep has dur1 + dur2
-            return (b["dur1"] + b["dur2"]) * b["reps"]
-        return 0  # fallback
 
-
-    def _block_avg_ratio(self, b: dict) -> float:
+    def _block_avg_ratio(self, b) -> float:
         """Return average FTP ratio (IF) for the block."""
         if not self.ftp:
             return 0.0
-
-        if b["type"] == "steady":
-            return b["power"] / self.ftp
-
-        if b["type"] in ("warmup", "cooldown"):
-            return (b["power_start"] + b["power_end"]) / 2 / self.ftp
-
-        if b["type"] == "interval":
-            on = b["power1"] / self.ftp
-            off = b["power2"] / self.ftp
-            total = (b["dur1"] + b["dur2"])
-            return (on * b["dur1"] + off * b["dur2"]) / total
-
-        return 0.0
+        return b.avg_watts(self.ftp) / self.ftp
+
+
+    def _block_totals(self, b):
+        """Return (sec, watts*sec, watts^2*sec, ratio*sec, ratio^2*sec) of one block."""
+        if b.type == "repeat":
+            # children once, then scaled by the repeat count
+            totals = [0, 0.0, 0.0, 0.0, 0.0]
+            for child in b.blocks:
+                for k, v in enumerate(self._block_totals(child)):
+                    totals[k] += v
+            return tuple(t * b.count for t in totals)
+        sec = b.seconds
+        if b.relative:
+            r = b.ratio
+            return sec, 0.0, 0.0, r * sec, r * r * sec
+        watts = b.avg_watts()
+        return sec, watts * sec, watts * watts * sec, 0.0, 0.0
+
+
+    def _apply_totals(self, totals, sign=1):
+        sec, watt_sec, watt2_sec, ratio_sec, ratio2_sec = totals
+        self._total_sec += sign * sec
+        self._watt_sec += sign * watt_sec
+        self._watt2_sec += sign * watt2_sec
+        self._ratio_sec += sign * ratio_sec
+        self._ratio2_sec += sign * ratio2_sec
+
+
+    def rebuild_totals(self):
+        """Recompute the running aggregates from scratch."""
+        self._total_sec = 0
+        self._watt_sec = 0.0
+        self._watt2_sec = 0.0
+        self._ratio_sec = 0.0
+        self._ratio2_sec = 0.0
+        for b in self.blocks:
+            self._apply_totals(self._block_totals(b))
+        self._revision += 1
 
 
     def total_seconds(self) -> int:
         """Sum of all block durations."""
-        return sum(self._block_seconds(b) for b in self.blocks)
+        return self._total_sec
+
+
+    def average_if(self) -> float:
+        """Duration-weighted average Intensity Factor."""
+        if not self._total_sec or not self.ftp:
+            return 0.0
+        return (self._watt_sec / self.ftp + self._ratio_sec) / self._total_sec
 
 
     def estimate_tss(self) -> float:
@@ -305,14 +505,34 @@ class Workout:
             TSS = (sec * IF^2) / 36
         where IF is duration-weighted average Intensity Factor.
         """
-        sec = self.total_seconds()
-        if sec == 0 or not self.ftp:
+        if self._total_sec == 0 or not self.ftp:
             return 0.0
 
-        # duration-weighted IF
-        total_if_x_sec = sum(
-            self._block_avg_ratio(b) ** 2 * self._block_seconds(b)
-            for b in self.blocks
-        )
+        # sum of per-block IF^2 * sec
+        total_if_x_sec = self._watt2_sec / (self.ftp * self.ftp) + self._ratio2_sec
         tss = total_if_x_sec / (36 * 1.0)  # 36 = 3600 sec / 100
-        return round(tss, 1)
\ No newline at end of file
+        return round(tss, 1)
+
+
+    def power_stream(self):
+        """Per-second target watts, built lazily and cached until the next edit or FTP change."""
+        cached = self._stream_cache
+        if cached is None or cached[0] != self._revision or cached[1] != self.ftp:
+            cached = (self._revision, self.ftp, metrics.power_stream(self.blocks, self.ftp))
+            self._stream_cache = cached
+        return cached[2]
+
+
+    def metrics(self) -> dict:
+        """
+        Normalized Power, IF, TSS, time in zone (seconds per zone of the
+        zone model) and peak powers from the per-second stream. Unlike
+        estimate_tss, ramps and intervals are weighted second by second.
+        """
+        cached = self._metrics_cache
+        if (cached is None or cached[0] != self._revision or cached[1] != self.ftp
+                or cached[2] is not self.zone_model):
+            cached = (self._revision, self.ftp, self.zone_model,
+                      metrics.summarize(self.power_stream(), self.ftp, self.zone_model))
+            self._metrics_cache = cached
+        return cached[3]
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Training zone models. A model is a list of zone labels with the upper
+bound of every zone but the last as a fraction of a reference value: FTP
+for power models, lactate threshold heart rate for heart-rate models.
+"""
+from bisect import bisect_right
+
+from metrics import time_in_zones
+
+# Timeline colors by zone index; models with more zones reuse the last one
+ZONE_COLORS = ("grey", "blue", "green", "yellow", "orange1", "red", "magenta")
+
+
+class ZoneModel:
+    """
+    Zone labels, bounds and target intensities. Thresholds in watts (or
+    bpm) are computed once per reference value and cached, so classifying
+    a value is a single bisect.
+    """
+    __slots__ = ("name", "title", "basis", "labels", "bounds", "targets", "_thresholds")
+
+    def __init__(self, name, title, labels, bounds, targets=None, basis="power"):
+        if len(bounds) != len(labels) - 1 or list(bounds) != sorted(bounds):
+            raise ValueError(f"Zone model {name}: need one ascending bound between each pair of zones")
+        self.name = name
+        self.title = title
+        self.basis = basis  # "power" (reference is FTP) or "hr" (threshold heart rate)
+        self.labels = tuple(labels)
+        self.bounds = tuple(bounds)
+        self.targets = dict(targets or {})  # label -> intensity used for blocks set by zone
+        self._thresholds = {}  # reference -> thresholds
+
+    def thresholds(self, reference) -> tuple:
+        """Upper bounds of all zones but the last at this FTP (or threshold HR)"""
+        th = self._thresholds.get(reference)
+        if th is None:
+            th = self._thresholds[reference] = tuple(reference * b for b in self.bounds)
+        return th
+
+    def index(self, value, reference) -> int:
+        """Zone index of value; zone i covers [thresholds[i-1], thresholds[i])"""
+        return bisect_right(self.thresholds(reference), value)
+
+    def classify(self, value, reference) -> str:
+        """Zone label of value ("Z?" without a usable reference or value)"""
+        if not reference or reference <= 0:
+            return "Z?"
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            return "Z?"
+        if value < 0:
+            return "Z?"
+        return self.labels[self.index(value, reference)]
+
+    def time_in_zones(self, stream, reference) -> list:
+        """Samples per zone for a whole per-second stream"""
+        return time_in_zones(stream, self.thresholds(reference))
+
+    def target(self, label):
+        """Target intensity (fraction of the reference) for label, or None"""
+        return self.targets.get(str(label).upper())
+
+    def color(self, label) -> str:
+        try:
+            i = self.labels.index(str(label).upper())
+        except ValueError:
+            return "white"
+        return ZONE_COLORS[min(i, len(ZONE_COLORS) - 1)]
+
+    def __repr__(self):
+        return f"ZoneModel({self.name!r})"
+
+
+MODELS = {m.name: m for m in (
+    ZoneModel(
+        "6zone", "6 power zones (default)",
+        ("Z1", "Z2", "Z3", "Z4", "Z5", "Z6"),
+        (0.60, 0.76, 0.90, 1.05, 1.19),
+        {"Z1": 0.55, "Z2": 0.65, "Z3": 0.80, "Z4": 0.95, "Z5": 1.10, "Z6": 1.25},
+    ),
+    ZoneModel(
+        "7zone", "7 power zones (Coggan)",
+        ("Z1", "Z2", "Z3", "Z4", "Z5", "Z6", "Z7"),
+        (0.55, 0.75, 0.90, 1.05, 1.20, 1.50),
+        {"Z1": 0.50, "Z2": 0.65, "Z3": 0.83, "Z4": 0.98, "Z5": 1.13, "Z6": 1.35, "Z7": 1.60},
+    ),
+    ZoneModel(
+        "hr5", "5 heart rate zones (% of threshold HR)",
+        ("Z1", "Z2", "Z3", "Z4", "Z5"),
+        (0.81, 0.90, 0.94, 1.00),
+        {"Z1": 0.75, "Z2": 0.86, "Z3": 0.92, "Z4": 0.97, "Z5": 1.03},
+        basis="hr",
+    ),
+)}
+
+DEFAULT_MODEL = MODELS["6zone"]
+
+
+def get_model(name) -> ZoneModel:
+    model = MODELS.get(str(name).lower())
+    if model is None:
+        raise ValueError(f"Unknown zone model: {name}. Use {', '.join(MODELS)}.")
+    return model
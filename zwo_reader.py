@@ -0,0 +1,103 @@
+import xml.etree.ElementTree as ET
+
+
+# Workout elements Zwerminal can represent; anything else (FreeRide,
+# MaxEffort, textevent, ...) is skipped.
+BLOCK_TAGS = {"steadystate", "warmup", "cooldown", "ramp", "intervalst"}
+
+
+def _attrs(elem):
+    """Element attributes keyed case-insensitively"""
+    return {k.lower(): v for k, v in elem.attrib.items()}
+
+
+def _seconds(attrs, key):
+    return int(round(float(attrs.get(key, 0))))
+
+
+def _ratio(attrs, *keys):
+    for key in keys:
+        if key in attrs:
+            return float(attrs[key])
+    return 0.0
+
+
+def _watts(ratio, ftp):
+    return max(0, int(round(ratio * ftp)))
+
+
+def element_to_block(tag, attrs, ftp):
+    """Translate one ZWO workout element into (block_type, params) in watts"""
+    if tag == "steadystate":
+        if "power" in attrs:
+            ratio = float(attrs["power"])
+        else:
+            ratio = (_ratio(attrs, "powerlow") + _ratio(attrs, "powerhigh")) / 2
+        return "steady", {
+            "zone": "AUTO",
+            "duration": _seconds(attrs, "duration"),
+            "power": _watts(ratio, ftp),
+        }
+
+    if tag == "intervalst":
+        return "interval", {
+            "power1": _watts(_ratio(attrs, "onpower", "poweronhigh", "poweronlow"), ftp),
+            "dur1": _seconds(attrs, "onduration"),
+            "power2": _watts(_ratio(attrs, "offpower", "powerofflow", "poweroffhigh"), ftp),
+            "dur2": _seconds(attrs, "offduration"),
+            "reps": max(1, int(attrs.get("repeat", 1))),
+        }
+
+    # Ramps. Zwerminal writes Cooldown as PowerLow=end/PowerHigh=start while
+    # other tools write PowerLow=start, so cooldowns are ordered by value.
+    low = _watts(_ratio(attrs, "powerlow"), ftp)
+    high = _watts(_ratio(attrs, "powerhigh"), ftp)
+    duration = _seconds(attrs, "duration")
+    if tag == "warmup":
+        return "warmup", {"power_start": low, "power_end": high, "duration": duration}
+    if tag == "cooldown":
+        return "cooldown", {"power_start": max(low, high), "power_end": min(low, high),
+                            "duration": duration}
+    if low == high:
+        return "steady", {"zone": "AUTO", "duration": duration, "power": low}
+    return ("warmup" if low < high else "cooldown"), {
+        "power_start": low, "power_end": high, "duration": duration,
+    }
+
+
+def iter_zwo_blocks(source, ftp):
+    """
+    Stream (block_type, params) pairs out of a .zwo file or file object.
+    Uses iterparse and clears each element once handled, so memory stays
+    bounded regardless of file size.
+    """
+    if not ftp or ftp <= 0:
+        raise ValueError("FTP must be set to import a ZWO file")
+
+    root = None
+    workout_elem = None
+    try:
+        for event, elem in ET.iterparse(source, events=("start", "end")):
+            tag = elem.tag.lower()
+            if event == "start":
+                if root is None:
+                    root = elem
+                elif tag == "workout" and workout_elem is None:
+                    workout_elem = elem
+                continue
+
+            if elem is workout_elem:
+                workout_elem = None
+            elif workout_elem is not None:
+                if tag in BLOCK_TAGS:
+                    try:
+                        yield element_to_block(tag, _attrs(elem), ftp)
+                    except ValueError as e:
+                        raise ValueError(f"Invalid <{elem.tag}> element: {e}")
+                # Drop finished blocks so the tree never grows
+                workout_elem.clear()
+                continue
+            if elem is not root:
+                root.clear()
+    except ET.ParseError as e:
+        raise ValueError(f"Invalid ZWO file: {e}")